@@ -0,0 +1,33 @@
+"""Memory per body of regular and columnar models, for a ring of 200k bodies.
+
+Run from the repository root with:
+
+    python -m benchmarks.columns
+
+"""
+
+import time
+import tracemalloc
+from selang import as_model, orbit, ring
+
+
+NB_BODY = 200000
+
+
+def measure(columnar:bool) -> (float, float):
+    """Return memory per body in bytes, and time to build the model"""
+    tracemalloc.start()
+    start = time.perf_counter()
+    model = as_model('Benchmark ring', ((1, ring(NB_BODY, 'moon'), orbit(0.01)),),
+                     {1: 'earth'}, columnar=columnar)
+    duration = time.perf_counter() - start
+    memory, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return memory / len(model.orbits), duration
+
+
+if __name__ == '__main__':
+    for columnar in (False, True):
+        memory, duration = measure(columnar)
+        print('{:>9}: {:>7.1f} bytes per body, built in {:.3f}s'.format(
+            'columnar' if columnar else 'regular', memory, duration))
@@ -0,0 +1,49 @@
+"""Regression benchmark of compile.compile_to_gen on a system of 100k orbits.
+
+Run from the repository root with:
+
+    python -m benchmarks.compile_to_gen
+
+The printed digest of the produced lines must not change between versions.
+
+"""
+
+import time
+import hashlib
+from selang import as_model, orbit, ref
+from selang.compile import compile_to_gen
+
+
+NB_ORBIT = 100000
+
+
+def big_system(nb_orbit:int=NB_ORBIT) -> object:
+    """A sun with planets, each planet having 9 moons"""
+    orbits, objects = [], {0: ref('sun')}
+    for uid in range(1, nb_orbit + 1):
+        if uid % 10 == 1:  # a planet orbiting the sun
+            planet = uid
+            objects[uid] = ref('earth')
+            orbits.append((0, uid, orbit(1 + uid / 10)))
+        else:  # a moon of the last planet
+            objects[uid] = ref('moon')
+            orbits.append((planet, uid, orbit(0.001 * (uid % 10), angle=uid % 360)))
+    return as_model('Benchmark system', tuple(orbits), objects)
+
+
+if __name__ == '__main__':
+    model = big_system()
+    digest = hashlib.sha256()
+    nb_line = 0
+    start = time.perf_counter()
+    star_lines, planet_lines = compile_to_gen(*model)
+    for line in star_lines:
+        digest.update(line.encode())
+        nb_line += 1
+    for line in planet_lines:
+        digest.update(line.encode())
+        nb_line += 1
+    duration = time.perf_counter() - start
+    print('orbits: {}'.format(len(model.orbits)))
+    print('lines:  {} in {:.3f}s ({:.0f} lines/s)'.format(nb_line, duration, nb_line / duration))
+    print('digest: {}'.format(digest.hexdigest()))
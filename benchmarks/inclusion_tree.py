@@ -0,0 +1,36 @@
+"""Scaling of compile.make_inclusion_tree, from 10 to 1,000,000 orbits.
+
+Run from the repository root with:
+
+    python -m benchmarks.inclusion_tree
+
+"""
+
+import time
+from selang.compile import make_inclusion_tree
+
+
+SIZES = (10, 100, 1000, 10000, 100000, 1000000)
+
+
+def deep_orbits(size:int) -> tuple:
+    """Moon of moon of moon... chain of given number of orbits"""
+    return tuple((uid, uid + 1, None) for uid in range(size))
+
+def flat_orbits(size:int) -> tuple:
+    """All bodies orbiting the same root"""
+    return tuple((0, uid, None) for uid in range(1, size + 1))
+
+
+def timeit(func:callable, *args) -> float:
+    start = time.perf_counter()
+    func(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    print('{:>10} {:>12} {:>12} {:>14}'.format('orbits', 'deep (s)', 'flat (s)', 'µs per orbit'))
+    for size in SIZES:
+        deep = timeit(make_inclusion_tree, deep_orbits(size))
+        flat = timeit(make_inclusion_tree, flat_orbits(size))
+        print('{:>10} {:>12.4f} {:>12.4f} {:>14.3f}'.format(size, deep, flat, 1e6 * max(deep, flat) / size))
@@ -0,0 +1,54 @@
+"""Time to expand rings of many bodies into orbits, for regular and columnar models,
+and to reload them from the binary format.
+
+Run from the repository root with:
+
+    python -m benchmarks.ring_expansion
+
+"""
+
+import os
+import time
+import tempfile
+from selang import as_model, orbit, ring, binary
+from selang.compile import ring_angles
+
+
+SIZES = 10 ** 4, 10 ** 5, 10 ** 6
+
+
+def ring_model(nb_body:int, columnar:bool):
+    return as_model('Benchmark ring', ((1, ring(nb_body, 'moon'), orbit(0.01, angle=3)),),
+                    {1: 'earth'}, columnar=columnar)
+
+
+def measure(nb_body:int, columnar:bool) -> float:
+    """Return time to build a model holding a ring of given size"""
+    start = time.perf_counter()
+    ring_model(nb_body, columnar)
+    return time.perf_counter() - start
+
+
+def measure_load(nb_body:int) -> float:
+    """Return time to load a model holding a ring of given size from a binary file"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, 'ring.selang')
+        binary.save(ring_model(nb_body, True), fname)
+        start = time.perf_counter()
+        binary.load(fname)
+        return time.perf_counter() - start
+
+
+def measure_angles(nb_body:int) -> float:
+    """Return time to compute the angles of a ring of given size"""
+    steps = ring(nb_body, 'moon').angle_steps
+    start = time.perf_counter()
+    ring_angles(3, steps)
+    return time.perf_counter() - start
+
+
+if __name__ == '__main__':
+    for nb_body in SIZES:
+        print('{:>8} bodies: angles in {:.3f}s, regular model in {:.3f}s, columnar model in {:.3f}s,'
+              ' binary load in {:.4f}s'.format(nb_body, measure_angles(nb_body), measure(nb_body, False),
+                                               measure(nb_body, True), measure_load(nb_body)))
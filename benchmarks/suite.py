@@ -0,0 +1,189 @@
+"""Benchmark suite timing each stage of the compilation of synthetic systems.
+
+Run from the repository root with:
+
+    python -m benchmarks.suite --output results.json
+
+Inputs are generated by benchmarks.synthetic, from a seed, so that
+two runs with the same seed and scale work on the same systems.
+For each shape and input format, the following stages are timed,
+keeping the best of --repeat runs:
+
+    parse -- extraction of the raw data (JSON parsing or ASP solving)
+    as_model -- building of the models from the raw data
+    check -- physical sanity checks of the models (selang.checks)
+    compile_to_gen -- rendering of all the lines of the models
+    write -- compilation of the models into files (compile_to_se)
+
+The throughput of selang.generate is also measured, and compared
+to GENERATION_TARGET systems per second.
+
+Results are printed, and written as JSON with --output.
+With --compare, results are compared to those of a previous run,
+and the exit code is 1 if a stage is slower than allowed by --tolerance.
+
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+from selang import model as model_module
+from selang import generate
+from selang.checks import check_model
+from selang.compile import compile_to_gen, compile_to_se
+from benchmarks import synthetic
+
+
+SCALES = {  # scale -> {case: (shape, number of systems or None, size)}
+    'small': {'deep': ('deep', None, 200), 'wide': ('wide', None, 1000),
+              'ring': ('ring', None, 10000), 'catalog': ('wide', 50, 20)},
+    'medium': {'deep': ('deep', None, 2000), 'wide': ('wide', None, 10000),
+               'ring': ('ring', None, 100000), 'catalog': ('wide', 500, 20)},
+    'large': {'deep': ('deep', None, 20000), 'wide': ('wide', None, 100000),
+              'ring': ('ring', None, 1000000), 'catalog': ('wide', 5000, 20)},
+}
+FORMATS = 'json', 'asp'
+STAGES = 'parse', 'as_model', 'check', 'compile_to_gen', 'write'
+TOLERANCE = 0.2  # allowed slowdown ratio before a regression is reported
+MIN_DURATION = 0.005  # stages shorter than this, in seconds, are too noisy to compare
+GENERATED = {'small': 10000, 'medium': 100000, 'large': 1000000}  # scale -> number of generated systems
+GENERATION_TARGET = 5000  # systems generated per second and per job
+
+
+def input_files(case:tuple, fmt:str, seed:int) -> {str: str}:
+    shape, nb_system, size = case
+    if nb_system is None:
+        return synthetic.system(shape, fmt, size, seed)
+    return synthetic.catalog(shape, fmt, nb_system, size, seed)
+
+
+def run_case(fnames:[str], outdir:str) -> dict:
+    """Return the duration of each stage, and the size of the compiled models"""
+    durations, start = {}, time.perf_counter()
+
+    def lap(stage:str):
+        nonlocal start
+        durations[stage] = time.perf_counter() - start
+        start = time.perf_counter()
+
+    extractor = model_module._extractor_of(fnames[0])
+    if len(fnames) > 1 and hasattr(extractor, 'batch_data'):
+        raw_data = list(extractor.batch_data(fnames))
+    else:
+        raw_data = [datum for fname in fnames for datum in extractor.data(fname)]
+    lap('parse')
+    models = [model_module.model_from(datum, extract=extractor) for datum in raw_data]
+    lap('as_model')
+    for model in models:
+        check_model(model)
+    lap('check')
+    nb_line = 0
+    for model in models:
+        for lines in compile_to_gen(*model):
+            nb_line += sum(1 for _ in lines)
+    lap('compile_to_gen')
+    for model in models:
+        compile_to_se(*model, (outdir, outdir), overwrite=True)
+    lap('write')
+    return {'systems': len(models), 'orbits': sum(len(model.orbits) for model in models),
+            'lines': nb_line, 'stages': durations}
+
+
+def run_generation(nb_system:int, seed:int, jobs:int) -> dict:
+    """Return the duration of the generation of given number of systems"""
+    start = time.perf_counter()
+    nb_orbit = sum(len(model.orbits) for model in generate.models(nb_system, seed, jobs=jobs))
+    return {'systems': nb_system, 'orbits': nb_orbit, 'lines': 0,
+            'stages': {'generate': time.perf_counter() - start}}
+
+
+def run_suite(scale:str, seed:int, repeat:int, formats:[str]=FORMATS, jobs:int=1) -> dict:
+    results = {}
+    for case_name, case in SCALES[scale].items():
+        for fmt in formats:
+            with tempfile.TemporaryDirectory() as tmpdir:
+                fnames = []
+                for fname, content in input_files(case, fmt, seed).items():
+                    fnames.append(os.path.join(tmpdir, fname))
+                    with open(fnames[-1], 'w') as fd:
+                        fd.write(content)
+                outdir = os.path.join(tmpdir, 'out')
+                os.mkdir(outdir)
+                runs = [run_case(sorted(fnames), outdir) for _ in range(repeat)]
+            result = runs[0]
+            result['stages'] = {stage: min(run['stages'][stage] for run in runs)
+                                for stage in STAGES}
+            results['{}/{}'.format(case_name, fmt)] = result
+            print_result('{}/{}'.format(case_name, fmt), result)
+    runs = [run_generation(GENERATED[scale], seed, jobs) for _ in range(repeat)]
+    result = min(runs, key=lambda run: run['stages']['generate'])
+    result['systems_per_second'] = result['systems'] / result['stages']['generate']
+    result['target'] = GENERATION_TARGET * jobs
+    results['generate/{}-jobs'.format(jobs)] = result
+    print_result('generate/{}-jobs'.format(jobs), result)
+    print('{:<16} {:.0f} systems/s, target {} systems/s: {}'.format(
+          '', result['systems_per_second'], result['target'],
+          'reached' if result['systems_per_second'] >= result['target'] else 'MISSED'))
+    return {'meta': {'scale': scale, 'seed': seed, 'repeat': repeat, 'jobs': jobs,
+                     'python': platform.python_version(), 'platform': platform.platform()},
+            'results': results}
+
+
+def print_result(name:str, result:dict):
+    print('{:<16} {:>7} orbits {:>8} lines  '.format(name, result['orbits'], result['lines'])
+          + '  '.join('{} {:.3f}s'.format(stage, duration) for stage, duration in result['stages'].items()))
+
+
+def regressions(baseline:dict, current:dict, tolerance:float=TOLERANCE) -> [str]:
+    """Return the description of stages of current results slower than
+    in baseline results, beyond given tolerance ratio"""
+    found = []
+    for name, result in current['results'].items():
+        if name not in baseline['results']:
+            continue
+        for stage, duration in result['stages'].items():
+            reference = baseline['results'][name]['stages'].get(stage)
+            if reference is None or max(reference, duration) < MIN_DURATION:
+                continue
+            if duration > reference * (1 + tolerance):
+                found.append('{} {}: {:.3f}s -> {:.3f}s (x{:.2f})'.format(
+                    name, stage, reference, duration, duration / max(reference, 1e-9)))
+    return found
+
+
+def cli_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=tuple(SCALES), default='small',
+                        help='size of the generated systems')
+    parser.add_argument('--seed', type=int, default=0,
+                        help='seed of the generated systems')
+    parser.add_argument('--repeat', type=int, default=3,
+                        help='number of runs of each case, the best one being kept')
+    parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS,
+                        help='input formats to benchmark')
+    parser.add_argument('--jobs', '-j', type=int, default=1,
+                        help='number of processes generating systems')
+    parser.add_argument('--output', '-o', type=str, default=None,
+                        help='JSON file receiving the results')
+    parser.add_argument('--compare', type=str, default=None,
+                        help='JSON results of a previous run to compare with')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE,
+                        help='allowed slowdown ratio of a stage when comparing')
+    return parser
+
+
+if __name__ == '__main__':
+    args = cli_parser().parse_args()
+    results = run_suite(args.scale, args.seed, args.repeat, args.formats, args.jobs)
+    if args.output:
+        with open(args.output, 'w') as fd:
+            json.dump(results, fd, indent=2)
+    if args.compare:
+        with open(args.compare) as fd:
+            found = regressions(json.load(fd), results, args.tolerance)
+        print('REGRESSIONS:' if found else 'No regression.', '\n  '.join(found))
+        sys.exit(1 if found else 0)
@@ -0,0 +1,94 @@
+"""Seeded generators of synthetic input files, in JSON and ASP.
+
+Each generator takes a random.Random, a size and a system name,
+and returns the text of an input file describing one system:
+
+    deep -- moons of moons of moons..., size levels deep.
+            JSON input only handles two levels: planets with moons,
+            so the JSON version has size moons spread over size // 10 planets.
+    wide -- size planets orbiting the same star
+    ring -- a ring of size moons around a star
+
+The catalog function builds many systems of a given shape,
+in one JSON file or in one ASP file per system.
+
+"""
+
+import json
+import random
+
+
+PLANETS = 'earth', 'moon'
+STARS = 'sun', 'red_dwarf', 'blue_giant'
+
+
+def _distance(rng:random.Random, low:float, high:float) -> str:
+    return str(round(rng.uniform(low, high), 6))
+
+
+def deep_asp(rng:random.Random, size:int, name:str='Deep') -> str:
+    lines = ['system(b0,"{}").'.format(name), 'is(b0,{}).'.format(rng.choice(STARS))]
+    for uid in range(1, size + 1):
+        lines.append('is(b{},{}).'.format(uid, rng.choice(PLANETS)))
+        lines.append('orbit(b{},b{},"{}").'.format(uid - 1, uid, _distance(rng, 0.001, 0.01)))
+    return '\n'.join(lines) + '\n'
+
+def deep_json(rng:random.Random, size:int, name:str='Deep') -> str:
+    nb_planet = max(1, size // 10)
+    planets = [{'type': 'earth', 'distance': float(_distance(rng, 0.5, 30)), 'childs': []}
+               for _ in range(nb_planet)]
+    for _ in range(size):
+        rng.choice(planets)['childs'].append({'type': 'moon', 'distance': float(_distance(rng, 0.001, 0.01))})
+    return json.dumps(_json_system(rng, name, planets))
+
+
+def wide_asp(rng:random.Random, size:int, name:str='Wide') -> str:
+    lines = ['system(b0,"{}").'.format(name), 'is(b0,{}).'.format(rng.choice(STARS))]
+    for uid in range(1, size + 1):
+        lines.append('is(p{},{}).'.format(uid, rng.choice(PLANETS)))
+        lines.append('orbit(b0,p{},"{}").'.format(uid, _distance(rng, 0.5, 30)))
+    return '\n'.join(lines) + '\n'
+
+def wide_json(rng:random.Random, size:int, name:str='Wide') -> str:
+    planets = [{'type': rng.choice(PLANETS), 'distance': float(_distance(rng, 0.5, 30))}
+               for _ in range(size)]
+    return json.dumps(_json_system(rng, name, planets))
+
+
+def ring_asp(rng:random.Random, size:int, name:str='Ring') -> str:
+    return 'system(b0,"{}").\nis(b0,{}).\norbit(b0,ring({},moon),"{}").\n'.format(
+        name, rng.choice(STARS), size, _distance(rng, 0.5, 30))
+
+def ring_json(rng:random.Random, size:int, name:str='Ring') -> str:
+    ring = {'type': ['ring', size, 'moon'], 'distance': float(_distance(rng, 0.5, 30))}
+    return json.dumps(_json_system(rng, name, [ring]))
+
+
+def _json_system(rng:random.Random, name:str, childs:list) -> dict:
+    return {'name': name, 'UID': name, 'type': rng.choice(STARS), 'childs': childs}
+
+
+GENERATORS = {  # (shape, format) -> generator
+    ('deep', 'asp'): deep_asp, ('deep', 'json'): deep_json,
+    ('wide', 'asp'): wide_asp, ('wide', 'json'): wide_json,
+    ('ring', 'asp'): ring_asp, ('ring', 'json'): ring_json,
+}
+EXTENSIONS = {'asp': '.lp', 'json': '.json'}
+
+
+def system(shape:str, fmt:str, size:int, seed:int=0) -> {str: str}:
+    """Return the input file of one system of given shape, as {file name: content}"""
+    rng = random.Random(seed)
+    name = shape.capitalize()
+    return {name + EXTENSIONS[fmt]: GENERATORS[shape, fmt](rng, size, name)}
+
+
+def catalog(shape:str, fmt:str, nb_system:int, size:int, seed:int=0) -> {str: str}:
+    """Return the input files of given number of systems of given shape and size,
+    as {file name: content}: one JSON file, or one ASP file per system"""
+    rng = random.Random(seed)
+    names = ['{}{}'.format(shape.capitalize(), idx) for idx in range(nb_system)]
+    generator = GENERATORS[shape, fmt]
+    if fmt == 'json':
+        return {'catalog.json': '[' + ','.join(generator(rng, size, name) for name in names) + ']'}
+    return {name + '.lp': generator(rng, size, name) for name in names}
@@ -0,0 +1,55 @@
+"""Lines written per second, rendering line by line or by compiled blocks,
+for a system of 1M bodies.
+
+Run from the repository root with:
+
+    python -m benchmarks.templates
+
+"""
+
+import os
+import time
+import tempfile
+from selang import as_model, orbit, ring
+from selang.compile import compile_to_gen, compile_to_blocks, _write_blocks
+from selang.stats import NO_STATS
+
+
+NB_BODY = 10 ** 6
+
+
+def write_lines(model, fname:str) -> int:
+    """Write the planet file line by line, return the number of lines"""
+    _, lines = compile_to_gen(*model)
+    nb_line = 0
+    with open(fname, 'w') as fd:
+        for line in lines:
+            fd.write(line + '\n')
+            nb_line += 1
+    return nb_line
+
+
+def write_blocks(model, fname:str):
+    """Write the planet file by compiled blocks"""
+    _, blocks = compile_to_blocks(*model)
+    _write_blocks(fname, blocks, NO_STATS)
+
+
+if __name__ == '__main__':
+    model = as_model('Benchmark ring', ((1, ring(NB_BODY, 'moon'), orbit(0.01, angle=3)),),
+                     {1: 'earth'})
+    with tempfile.TemporaryDirectory() as tmpdir:
+        fname = os.path.join(tmpdir, 'planets.sc')
+        start = time.perf_counter()
+        nb_line = write_lines(model, fname)
+        by_line = time.perf_counter() - start
+        with open(fname) as fd:
+            expected = fd.read()
+        start = time.perf_counter()
+        write_blocks(model, fname)
+        by_block = time.perf_counter() - start
+        with open(fname) as fd:
+            assert fd.read() == expected, "outputs differ"
+    for method, duration in (('line by line', by_line), ('compiled blocks', by_block)):
+        print('{:>15}: {:>10.0f} lines per second ({} lines in {:.2f}s)'.format(
+            method, nb_line / duration, nb_line, duration))
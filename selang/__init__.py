@@ -1,2 +1,14 @@
-from .objects_builder import ref, ring, planet, star, orbit
-from .model import models_to_se, model_to_se, get_models, as_model
+"""Compilation of solar systems described in ASP or JSON into SpaceEngine scripts.
+
+The ASP backend (clyngor and clingo) is imported only when ASP files are used:
+
+>>> import sys, subprocess
+>>> code = 'import sys, selang; print("clyngor" in sys.modules, "clingo" in sys.modules)'
+>>> subprocess.run([sys.executable, '-c', code], capture_output=True, text=True).stdout.split()
+['False', 'False']
+
+"""
+
+from .objects_builder import ref, ring, planet, star, orbit, register_preset
+from .model import models_to_se, model_to_se, get_models, as_model, model_to_bytes, models_to_bytes
+from .stats import Stats, collecting
@@ -3,9 +3,14 @@
 """
 
 import os
+import json
 from . import cli
 
 from . import get_models, models_to_se
+from .model import models_to_packed, input_files
+from .compile import output_files
+from .stats import Stats, collecting
+from .atomic import atomic_open
 
 
 if __name__ == '__main__':
@@ -15,5 +20,42 @@ if __name__ == '__main__':
         outdir = args.test_dir, args.test_dir
     else:  # user gives us a good ol' space engine directory
         outdir = args.se_dir
-    models = get_models(args.infile)
-    models_to_se(models, outdir)
+    stats = Stats() if args.profile or args.stats_json else None
+    model_options = {'nb_model': args.models, 'optimal_only': args.optimal_only, 'seed': args.seed}
+    if not args.no_solve_cache and any(os.path.splitext(fname)[1] == '.lp' for fname in input_files(args.infile)):
+        from .solve_cache import SolveCache
+        model_options['solve_cache'] = SolveCache()
+    with collecting(stats):
+        models = get_models(args.infile, **model_options)
+        if args.check:
+            from .checks import checked_models
+            models = checked_models(models)
+        if args.catalog or args.archive:  # packed outputs and watch mode are imported on demand
+            from .catalog import CatalogWriter, ArchiveWriter
+            if args.catalog:
+                writer = CatalogWriter(*output_files(args.catalog, outdir))
+            else:
+                writer = ArchiveWriter(args.archive)
+            errors = models_to_packed(models, writer)
+        elif args.binary:
+            from .binary import save
+            save(models, args.binary)
+            errors = ()
+        elif args.watch:
+            from .watch import watch
+            try:
+                watch(args.infile, outdir, jobs=args.jobs, overwrite=args.overwrite,
+                      rebuild=args.no_cache, fsync=args.fsync, check=args.check, **model_options)
+            except KeyboardInterrupt:
+                errors = ()
+        else:
+            errors = models_to_se(models, outdir, jobs=args.jobs, overwrite=args.overwrite,
+                                  cache=True, rebuild=args.no_cache, fsync=args.fsync)
+    if args.profile:
+        print(stats.report())
+    if args.stats_json:
+        with atomic_open(args.stats_json) as fd:
+            json.dump(stats.as_dict(), fd, indent=4)
+    if errors:
+        print('{} system(s) failed:'.format(len(errors)), ', '.join(name for name, _ in errors))
+        exit(1)
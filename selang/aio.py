@@ -0,0 +1,149 @@
+"""Asyncio API, for embedding selang in asynchronous services.
+
+Extraction (ASP solving, JSON parsing) and compilation are blocking,
+so they run in an executor, their results being streamed as async iterators.
+Semaphores bound the number of extractions and of compilations running
+at the same time, so that many requests can be handled concurrently
+without exhausting the executor.
+Blocking code runs in the context of the calling task, so that it is
+instrumented by the Stats collecting in this task, if any.
+
+"""
+
+import asyncio
+import weakref
+import concurrent.futures
+import collections
+from .objects import Model
+from .stats import in_context
+from .cache import BuildCache
+from .compile import output_dirs, output_files
+from .model import get_models, _model_to_se_or_error
+
+
+EXTRACTION_LIMIT = 4  # default number of extractions running at the same time
+COMPILATION_LIMIT = 8  # default number of models compiled at the same time
+QUEUE_SIZE = 16  # number of models extracted in advance
+PENDING_SIZE = 64  # number of models waiting for their compilation, or their turn to be yielded
+_END = object()  # marks the end of extraction
+_semaphores = weakref.WeakKeyDictionary()  # event loop -> {limit name: semaphore}
+
+
+def default_semaphore(name:str) -> asyncio.Semaphore:
+    """Return the semaphore shared by all calls in the running event loop,
+    for given limit name, either 'extraction' or 'compilation'"""
+    limits = {'extraction': EXTRACTION_LIMIT, 'compilation': COMPILATION_LIMIT}
+    semaphores = _semaphores.setdefault(asyncio.get_running_loop(), {})
+    if name not in semaphores:
+        semaphores[name] = asyncio.Semaphore(limits[name])
+    return semaphores[name]
+
+
+async def aget_models(fname:str or iter, semaphore:asyncio.Semaphore=None,
+                      executor:object=None, **options) -> [Model]:
+    """Async iterator over the models of get_models, extracted in a thread
+    of given executor (by default the one of the event loop).
+
+    semaphore -- bounds the number of extractions running at the same time.
+                 Don't give the one given to amodels_to_se, which would wait
+                 forever for the extraction to release it.
+    options -- given to get_models
+
+    """
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue(QUEUE_SIZE)
+    stopped = False
+
+    def put(item:object) -> bool:
+        """Put given item in the queue, return False if iteration stopped"""
+        if stopped:
+            return False
+        try:
+            asyncio.run_coroutine_threadsafe(queue.put(item), loop).result()
+        except (concurrent.futures.CancelledError, RuntimeError):  # loop closing or closed
+            return False
+        return not stopped
+
+    def extract():
+        try:
+            for model in get_models(fname, **options):
+                if not put(model):
+                    return
+        except Exception as err:
+            put(err)
+        else:
+            put(_END)
+
+    async with semaphore or default_semaphore('extraction'):
+        extraction = loop.run_in_executor(executor, in_context(extract))
+        try:
+            while True:
+                item = await queue.get()
+                if item is _END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+            await extraction
+        finally:
+            stopped = True
+            while not queue.empty():  # unblock the extraction, that will stop
+                queue.get_nowait()
+
+
+async def amodels_to_se(models:[Model], se_addons_dir:str or (str, str),
+                        overwrite:bool=True, cache:bool=False,
+                        semaphore:asyncio.Semaphore=None, executor:object=None) -> [tuple]:
+    """Async iterator over the system name, number of orbits, written files
+    and raised error of each given model, compiled in given executor
+    (by default the one of the event loop), in the order of the models.
+
+    models -- iterable or async iterable of models, e.g. from aget_models
+    semaphore -- bounds the number of models compiled at the same time
+    See models_to_se for other arguments.
+
+    Two models writing the same files are never compiled concurrently,
+    so that the last one always wins.
+
+    """
+    loop = asyncio.get_running_loop()
+    semaphore = semaphore or default_semaphore('compilation')
+    if cache:
+        cache = await loop.run_in_executor(executor, in_context(BuildCache), output_dirs(se_addons_dir)[1])
+
+    async def compile_model(model:Model, previous:asyncio.Future) -> tuple:
+        if previous is not None:
+            await asyncio.wait([previous])
+        async with semaphore:  # released even if cancelled
+            return await loop.run_in_executor(executor, in_context(_model_to_se_or_error), model,
+                                              se_addons_dir, overwrite, cache or None)
+
+    pending = collections.deque()  # compilation tasks, in models order
+    running = {}  # planet file -> task of the last model writing it
+    try:
+        async for model in _aiter(models):
+            if len(pending) >= PENDING_SIZE:
+                yield await pending.popleft()
+            planet_file = output_files(model.system_name, se_addons_dir)[1]
+            task = loop.create_task(compile_model(model, running.get(planet_file)))
+            pending.append(task)
+            running[planet_file] = task
+            while pending and pending[0].done():
+                yield pending.popleft().result()
+        while pending:
+            yield await pending.popleft()
+    finally:
+        if pending:  # iteration stopped early: let running compilations end
+            await asyncio.wait(pending)
+        if cache:
+            await loop.run_in_executor(executor, in_context(cache.save))
+
+
+async def _aiter(iterable:iter) -> iter:
+    """Async iterator over given iterable or async iterable"""
+    if hasattr(iterable, '__aiter__'):
+        async for item in iterable:
+            yield item
+    else:
+        for item in iterable:
+            yield item
@@ -1,30 +1,178 @@
-"""Routines to build model from ASP data"""
+"""Routines to build model from ASP data.
+
+clyngor is imported on first solving, so that using JSON only
+neither pays for its import nor needs it installed.
+
+"""
 
-import clyngor
-import itertools
 from .objects import (Model, Orbit, OBJECTS, OBJECTS_NAME, RING_ARGS_ORDER, ORBIT_ARGS_ORDER,
                       STAR_ARGS_ORDER, PLANET_ARGS_ORDER, BARY_ARGS_ORDER)
 from .objects_builder import (ref, ring as ring_builder, planet as planet_builder,
                               star as star_builder, barycenter as bary_builder)
-from .commons import asp_value_to_pyvalue
+from .commons import asp_value_to_pyvalue, uid_generator
+
+
+INPUT_GUARD = '__selang_input'  # external atom enabling the program of a file
+ALONE_STATEMENTS = {  # statements affecting the whole control: their files are solved alone
+    'Definition', 'Script',  # constants and scripts
+    'ShowSignature', 'ShowTerm', 'ProjectAtom', 'ProjectSignature', 'Defined',  # shown atoms
+}
+
+
+def solver_options(optimal_only:bool=False, seed:int=None) -> [str]:
+    """Return clingo options implementing given answer set selection.
+
+    optimal_only -- enumerate the optimal answer sets only
+                    (all answer sets are optimal in absence of optimization)
+    seed -- if given, the search space is explored randomly, using this seed
+
+    """
+    options = []
+    if optimal_only:
+        options.append('--opt-mode=optN')
+    if seed is not None:
+        options += ['--seed={}'.format(seed), '--rand-freq=1', '--sign-def=rnd']
+    return options
+
+
+def data(fname:str, nb_model:int=0, optimal_only:bool=False, seed:int=None,
+         cache:'SolveCache'=None) -> [dict]:
+    """Yield the extracted data from given file.
+
+    nb_model -- maximal number of answer sets, 0 for all.
+                The solver stops as soon as they are found.
+    cache -- solve_cache.SolveCache replaying the answer sets of unchanged files,
+             and recording the others once all are yielded
+
+    See solver_options for other arguments.
+
+    """
+    key = cache and cache.key(fname, nb_model=nb_model, optimal_only=optimal_only,
+                              seed=seed, batch=False)
+    answers = cache.load(key) if key else None
+    if answers is not None:
+        yield from answers
+        return
+    answers = _solved(fname, nb_model, optimal_only, seed)
+    yield from cache.recording(key, answers) if key else answers
 
 
+def _solved(fname:str, nb_model:int, optimal_only:bool, seed:int) -> [dict]:
+    import clyngor
+    answers = clyngor.solve(fname, options=solver_options(optimal_only, seed),
+                            nb_model=nb_model)
+    for answer, optimization, optimality in _parsed(answers).with_optimality:
+        if optimality or not optimization or not optimal_only:
+            yield answer
 
-# rebuild all with specific uids
-_gen_uid = itertools.count(1)
-gen_uid = lambda: next(_gen_uid)
 
+def batch_data(fnames:[str], nb_model:int=0, optimal_only:bool=False, seed:int=None,
+               cache:'SolveCache'=None) -> [dict]:
+    """Yield the extracted data from all given files, file after file.
 
-def data(fname:str) -> [dict]:
-    """Yield the extracted data from given file"""
+    When the clingo module is available, files are grounded together
+    in a single clingo control: the statements of each file are guarded
+    by an external atom, so that solving with only one guard enabled
+    yields the answer sets of that file alone.
+    Optimization problems share another control, because the mere presence
+    of an optimization statement changes the enumeration of answer sets.
+    Files defining constants or scripts, or selecting the shown atoms
+    (see ALONE_STATEMENTS), can't be isolated that way, and are solved alone.
+    Files found in given cache are neither grounded nor solved.
+
+    See data for arguments.
+
+    """
+    import clyngor
+    try:
+        import clingo
+        import clingo.ast
+    except ImportError:  # no clingo module: one solving per file
+        for fname in fnames:
+            yield from data(fname, nb_model, optimal_only, seed, cache)
+        return
+
+    keys = [cache and cache.key(fname, nb_model=nb_model, optimal_only=optimal_only,
+                                seed=seed, batch=True) for fname in fnames]
+    cached = [bool(key) and cache.has(key) for key in keys]
+    alone_types = {getattr(clingo.ast.ASTType, name) for name in ALONE_STATEMENTS}
+    kinds, programs = [], {}  # kind of each file ; kind -> [(file index, statements)]
+    for idx, fname in enumerate(fnames):
+        if cached[idx]:
+            kinds.append(None)
+            continue
+        statements = []
+        clingo.ast.parse_files([fname], statements.append)
+        types = {stm.ast_type for stm in statements}
+        if types & alone_types:
+            kind = None  # solved alone
+        else:
+            kind = clingo.ast.ASTType.Minimize in types
+            programs.setdefault(kind, []).append((idx, statements))
+        kinds.append(kind)
+    options = ['--models={}'.format(nb_model), *solver_options(optimal_only, seed)]
+    controls = {kind: _guarded_control(kind_programs, options)
+                for kind, kind_programs in programs.items()}
+
+    for idx, (fname, kind) in enumerate(zip(fnames, kinds)):
+        answers = cache.load(keys[idx]) if cached[idx] else None
+        if answers is not None:
+            yield from answers
+            continue
+        if kind is None:  # including cached files evicted since
+            yield from data(fname, nb_model, optimal_only, seed, cache)
+            continue
+        ctl, guard = controls[kind], _input_guard(idx)
+        ctl.assign_external(guard, True)
+        with ctl.solve(yield_=True) as models:
+            answer_sets = (' '.join(str(atom) for atom in model.symbols(shown=True)
+                                    if not atom.match(INPUT_GUARD, 1))
+                           for model in models
+                           if model.optimality_proven or not model.cost or not optimal_only)
+            answers = _parsed(clyngor.Answers(answer_sets))
+            yield from cache.recording(keys[idx], answers) if keys[idx] else answers
+        ctl.assign_external(guard, False)
+
+
+def _input_guard(idx:int) -> object:
+    """Return the clingo symbol guarding the program of file of given index"""
+    import clingo
+    return clingo.Function(INPUT_GUARD, [clingo.Number(idx)])
+
+
+def _guarded_control(programs:[(int, list)], options:[str]) -> object:
+    """Return a clingo control grounding all given programs,
+    each guarded by the external atom of its file index"""
+    import clingo
+    import clingo.ast
+    ctl = clingo.Control(options)
+    with clingo.ast.ProgramBuilder(ctl) as builder:
+        for idx, statements in programs:
+            guard = _input_guard(idx)
+            for stm in statements:
+                if 'body' in stm.keys():
+                    location = stm.location
+                    literal = clingo.ast.Literal(location, clingo.ast.Sign.NoSign,
+                        clingo.ast.SymbolicAtom(clingo.ast.SymbolicTerm(location, guard)))
+                    stm = stm.update(body=[*stm.body, literal])
+                builder.add(stm)
+    for idx, _ in programs:
+        ctl.add('base', [], '#external {}.'.format(_input_guard(idx)))
+    ctl.ground([('base', [])])
+    return ctl
+
+
+def _parsed(answers:'clyngor.Answers') -> [dict]:
+    """Return given answers as expected by root_info and populate_orbits"""
     # do not parse int, so that uids in ASP code are all strings,
     #  therefore they cannot collide with those generated by gen_uid()
-    yield from clyngor.solve(fname).by_predicate.parse_args.careful_parsing.int_not_parsed
+    return answers.by_predicate.parse_args.careful_parsing.int_not_parsed
 
 
 def root_info(asp_model, objects:dict) -> (str, str, ...):
     """Return the root uid, the system name, and data to be given
-    to populate_orbits function.
+    to populate_orbits function: the map from asp uids to global uids,
+    and the generator of uids used to rebuild all with specific uids.
 
     asp_model -- dictionnary containing definition of asp atoms
     objects -- dict. Modified, so root_uid maps to the root definition.
@@ -45,23 +193,24 @@ def root_info(asp_model, objects:dict) -> (str, str, ...):
         print('No root. Bad.')
         exit(1)  # TODO: determine the root by yourself
 
-    aspuids = _populate_objects(asp_model, objects)  # side effect
+    gen_uid = uid_generator()
+    aspuids = _populate_objects(asp_model, objects, gen_uid)  # side effect
     if root_uid not in aspuids:
         assert root_uid not in objects
         aspuids[root_uid] = root_uid
         objects[root_uid] = ref(root_uid)
-    return aspuids[root_uid], system_name, aspuids
+    return aspuids[root_uid], system_name, aspuids, gen_uid
 
 
-def populate_orbits(asp_model, orbits:list, objects:dict, root_uid:str, aspuids:dict):
-    for args in asp_model.get('orbit', ()):
+def populate_orbits(asp_model, orbits:list, objects:dict, root_uid:str, aspuids:dict, gen_uid:callable):
+    for args in _sorted(asp_model.get('orbit', ())):
         if len(args) >= 3:
-            gen_orbits(args, objects, orbits, aspuids)
+            gen_orbits(args, objects, orbits, aspuids, gen_uid)
         else:
             raise ValueError('Non valid: {}'.format(args))
 
 
-def gen_orbits(args:tuple, objects:dict, orbits:list, aspuids:dict) -> int:
+def gen_orbits(args:tuple, objects:dict, orbits:list, aspuids:dict, gen_uid:callable) -> int:
     """Populate given orbits, return parent uid"""
     parent, child, orbit_params, *properties = args
 
@@ -104,12 +253,12 @@ def gen_orbits(args:tuple, objects:dict, orbits:list, aspuids:dict) -> int:
         direct_child = child[1][0]
         # generate the subtree
         # print('RECURSIVE CALL WITH:', child[1], objects, orbits)
-        direct_child_uid = gen_orbits(child[1], objects, orbits, aspuids)
+        direct_child_uid = gen_orbits(child[1], objects, orbits, aspuids, gen_uid)
         assert direct_child_uid in objects
         # make the link between parent and immediate child
         subargs = (args[0], direct_child_uid, *args[2:])
         # print('RECURSIVE CALL WITH:', subargs, objects, orbits)
-        return gen_orbits(subargs, objects, orbits, aspuids)
+        return gen_orbits(subargs, objects, orbits, aspuids, gen_uid)
     elif isinstance(child, str) and child in aspuids:  # id
         child_uid, child = aspuids[child], objects[aspuids[child]]
     elif isinstance(child, int) and child in objects:  # id
@@ -136,10 +285,10 @@ def gen_orbits(args:tuple, objects:dict, orbits:list, aspuids:dict) -> int:
     return parent_uid
 
 
-def _populate_objects(asp_model, objects:dict) -> dict:
+def _populate_objects(asp_model, objects:dict, gen_uid:callable) -> dict:
     """Populate given objects dict and return a map from asp uid to global uid"""
     aspuids = {}  # aspuid -> newuid
-    for args in asp_model.get('is', ()):
+    for args in _sorted(asp_model.get('is', ())):
         if len(args) == 2:
             uid, obj = args
             if uid in objects:
@@ -158,6 +307,12 @@ def _populate_objects(asp_model, objects:dict) -> dict:
                                  "".format(type(obj), obj))
     return aspuids
 
+def _sorted(atoms:frozenset) -> [tuple]:
+    """Return given atoms in a fixed order, so that uids are generated
+    the same way whatever the iteration order of sets"""
+    return sorted(atoms, key=repr)
+
+
 def _asp_tuple_to_object(atom:tuple) -> object:
     """Return the object equivalent of given planet or star in ASP"""
     assert isinstance(atom, tuple) and atom[0] in OBJECTS_NAME
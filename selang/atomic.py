@@ -0,0 +1,94 @@
+"""Writing of files that are never seen partially written,
+even by concurrent processes.
+
+"""
+
+import os
+import itertools
+import threading
+import contextlib
+try:
+    import fcntl
+except ImportError:  # not on unix: no advisory lock
+    fcntl = None
+
+
+LOCK_NAME = '.selang-lock'  # lock file created in locked directories
+_TEMPORARY_IDS = itertools.count()  # distinguishes the temporary files of a thread
+
+
+def temporary_name(fname:str) -> str:
+    """Return the name of the temporary file to write in place of given one,
+    unique to the calling process, thread and call"""
+    return '{}.tmp-{}-{}-{}'.format(fname, os.getpid(), threading.get_ident(), next(_TEMPORARY_IDS))
+
+
+def remove_if_exists(fname:str):
+    with contextlib.suppress(FileNotFoundError):
+        os.remove(fname)
+
+
+@contextlib.contextmanager
+def atomic_open(fname:str, mode:str='w', buffering:int=-1):
+    """Context manager yielding a file object writing into a temporary file,
+    that replaces given file once closed without error.
+
+    On error, the temporary file is removed, leaving given file untouched.
+
+    """
+    tmp_fname = temporary_name(fname)
+    try:
+        with open(tmp_fname, mode, buffering=buffering) as fd:
+            yield fd
+        os.replace(tmp_fname, fname)
+    except BaseException:
+        remove_if_exists(tmp_fname)
+        raise
+
+
+@contextlib.contextmanager
+def directory_lock(directory:str):
+    """Context manager holding an exclusive advisory lock on given directory,
+    shared by all processes using it.
+
+    Locks are not reentrant: don't lock a directory already locked by the process.
+    Without fcntl (i.e. not on unix), nothing is locked.
+
+    """
+    if fcntl is None:
+        yield
+        return
+    with open(os.path.join(directory or '.', LOCK_NAME), 'a') as fd:
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+
+
+class Syncer:
+    """Batch of written files, flushed to disk at once with sync(),
+    along with their directories, so that their new content is durable"""
+
+    def __init__(self):
+        self.files = set()
+
+    def add(self, fname:str):
+        self.files.add(os.path.abspath(fname))
+
+    def sync(self):
+        for fname in self.files:
+            with contextlib.suppress(FileNotFoundError):
+                _fsync(fname, os.O_RDONLY)
+        for directory in {os.path.dirname(fname) for fname in self.files}:
+            with contextlib.suppress(OSError):  # directories can't be opened everywhere
+                _fsync(directory, os.O_RDONLY | getattr(os, 'O_DIRECTORY', 0))
+        self.files.clear()
+
+
+def _fsync(path:str, flags:int):
+    fd = os.open(path, flags)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
@@ -0,0 +1,178 @@
+"""Binary format of normalized models, loaded without parsing nor normalization.
+
+A file holds any number of models, stored as the columns of a ColumnarModel:
+
+    header -- MAGIC, format version and size of the metadata (see HEADER)
+    metadata -- JSON describing each model: its system name, the sections
+                holding its arrays, the defaults and pools of its columns,
+                and the pool of its objects
+    sections -- raw arrays (uids, kinds and numbers of orbit columns,
+                object table), each aligned on 8 bytes
+
+Files are memory-mapped when loaded: the arrays of the loaded models
+are views over the file, so that loading costs the same whatever the number
+of orbits, and the loaded models are read-only.
+They are copied when pickled, e.g. to be compiled by other processes:
+
+>>> import io, os, tempfile, contextlib
+>>> from selang import generate, models_to_se
+>>> tmp = tempfile.mkdtemp()
+>>> save([generate.system(seed=42, index=index) for index in range(4)], os.path.join(tmp, 'k.selang'))
+>>> def compiled(jobs:int) -> (list, dict):
+...     outdir = tempfile.mkdtemp(dir=tmp)
+...     with contextlib.redirect_stdout(io.StringIO()):
+...         errors = models_to_se(load(os.path.join(tmp, 'k.selang')), (outdir, outdir), jobs=jobs)
+...     return errors, {fname: open(os.path.join(outdir, fname)).read() for fname in os.listdir(outdir)}
+>>> compiled(jobs=2) == compiled(jobs=1)
+True
+
+"""
+
+import sys
+import json
+import mmap
+import struct
+from array import array
+from .objects import Model, OBJECTS
+from .columns import ColumnarModel, OrbitColumns, ObjectTable
+from .atomic import atomic_open
+
+
+EXTENSIONS = ('.selang',)
+MAGIC = b'SELANG\x00M'
+VERSION = 2  # change it when the format changes
+HEADER = struct.Struct('<8sIQ')  # magic, version, size of the metadata
+ALIGNMENT = 8
+OBJECT_TYPES = {cls.__name__: cls for cls in OBJECTS}  # name -> namedtuple
+
+
+def save(models:[Model] or Model, fname:str):
+    """Write given models in given file, atomically"""
+    models = [models] if isinstance(models, Model) else models
+    sections = []  # arrays, in file order
+    offset = 0
+
+    def section(values:array or memoryview) -> [int, str, int]:
+        """Register given array, return its offset, typecode and length"""
+        nonlocal offset
+        sections.append(values)
+        location = [offset, getattr(values, 'typecode', None) or values.format, len(values)]
+        offset += _aligned(len(values) * values.itemsize)
+        return location
+
+    metadata = {'byteorder': sys.byteorder, 'models': []}
+    for model in models:
+        model = model if isinstance(model, ColumnarModel) else ColumnarModel(*model)
+        orbits, objects = model.orbits, model.objects
+        metadata['models'].append({
+            'system_name': model.system_name,
+            'parents': section(orbits.parents),
+            'childs': section(orbits.childs),
+            'columns': [{'default': _encoded(column.default)} if column.kinds is None else {
+                'default': _encoded(column.default),
+                'kinds': section(column.kinds),
+                'numbers': section(column.numbers),
+                'pool': [_encoded(value) for value in column.pool],
+            } for column in orbits.columns],
+            'objects': {
+                'pool': [_encoded(obj) for obj in objects.pool],
+                'index': section(objects.index),
+                'order': {'uids': [_encoded(uid) for uid in objects.order]}
+                         if isinstance(objects.order, list) else
+                         None if objects.order is None else section(objects.order),
+                'size': len(objects),
+                'others': [[_encoded(uid), position] for uid, position in objects.others.items()],
+            },
+        })
+    encoded_metadata = json.dumps(metadata).encode()
+    start = _aligned(HEADER.size + len(encoded_metadata))
+    with atomic_open(fname, 'wb') as fd:
+        fd.write(HEADER.pack(MAGIC, VERSION, len(encoded_metadata)))
+        fd.write(encoded_metadata)
+        fd.write(bytes(start - fd.tell()))
+        for values in sections:
+            fd.write(values.tobytes())
+            fd.write(bytes(_aligned(fd.tell()) - fd.tell()))
+
+
+def load(fname:str) -> [ColumnarModel]:
+    """Return the models stored in given file, as views over it"""
+    with open(fname, 'rb') as fd:
+        try:
+            content = memoryview(mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ))
+        except ValueError:  # empty file
+            content = memoryview(b'')
+    if len(content) < HEADER.size:
+        raise ValueError("{} is not a selang binary file".format(fname))
+    magic, version, metadata_size = HEADER.unpack_from(content)
+    if magic != MAGIC:
+        raise ValueError("{} is not a selang binary file".format(fname))
+    if version != VERSION:
+        raise ValueError("{} is in version {} of the binary format, expected {}".format(fname, version, VERSION))
+    metadata = json.loads(bytes(content[HEADER.size:HEADER.size + metadata_size]))
+    start = _aligned(HEADER.size + metadata_size)
+    swapped = metadata['byteorder'] != sys.byteorder
+
+    def section(location:[int, str, int]) -> memoryview or array:
+        offset, typecode, length = location
+        view = content[start + offset:start + offset + length * array(typecode).itemsize].cast(typecode)
+        if swapped:  # foreign byte order: copied, then swapped
+            view = array(typecode, view.tobytes())
+            view.byteswap()
+        return view
+
+    return [_model(data, section) for data in metadata['models']]
+
+
+def _model(data:dict, section:callable) -> ColumnarModel:
+    orbits = OrbitColumns()
+    orbits.parents, orbits.childs = section(data['parents']), section(data['childs'])
+    for column, column_data in zip(orbits.columns, data['columns']):
+        column.size = len(orbits.parents)
+        column.default = _decoded(column_data['default'])
+        if 'kinds' in column_data:
+            column.kinds, column.numbers = section(column_data['kinds']), section(column_data['numbers'])
+            column.pool = [_decoded(value) for value in column_data['pool']]
+    objects = ObjectTable()
+    objects.pool = [_decoded(obj) for obj in data['objects']['pool']]
+    objects.index = section(data['objects']['index'])
+    order = data['objects']['order']
+    if isinstance(order, dict):
+        objects.order = [_decoded(uid) for uid in order['uids']]
+    elif order is not None:
+        objects.order = section(order)
+    objects.size = data['objects']['size']
+    objects.others = {_decoded(uid): position for uid, position in data['objects']['others']}
+    return ColumnarModel(data['system_name'], orbits, objects)
+
+
+def _aligned(size:int) -> int:
+    return -(-size // ALIGNMENT) * ALIGNMENT
+
+
+def _encoded(value:object) -> object:
+    """Return the JSON equivalent of given object or value"""
+    if type(value) in OBJECTS:
+        return {'type': type(value).__name__, 'fields': [_encoded(field) for field in value]}
+    if isinstance(value, tuple):
+        return {'tuple': [_encoded(item) for item in value]}
+    if isinstance(value, list):
+        return [_encoded(item) for item in value]
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    raise ValueError("Can't store value {} of type {} in binary format".format(value, type(value)))
+
+def _decoded(value:object) -> object:
+    """Return the object or value of given JSON equivalent"""
+    if isinstance(value, dict):
+        if 'type' in value:
+            return OBJECT_TYPES[value['type']](*map(_decoded, value['fields']))
+        return tuple(map(_decoded, value['tuple']))
+    if isinstance(value, list):
+        return list(map(_decoded, value))
+    return value
+
+
+def models(fname:str) -> [ColumnarModel]:
+    """Yield the models stored in given file, for get_models"""
+    yield from load(fname)
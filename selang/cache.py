@@ -0,0 +1,91 @@
+"""Content-addressed build cache, allowing to skip the compilation
+of systems that did not change since the last run.
+
+The cache is a manifest stored next to the planet files, mapping each
+written system to the hash of its model and the state of its files.
+
+"""
+
+import os
+import json
+import hashlib
+from .atomic import atomic_open, directory_lock
+
+
+MANIFEST_NAME = '.selang-manifest.json'
+CACHE_VERSION = 1  # increment when the generated scripts change for a same model
+
+
+def model_hash(system_name:str, orbits:tuple, objects:dict) -> str:
+    """Return the hex digest identifying given normalized model"""
+    content = repr((CACHE_VERSION, system_name, tuple(orbits), tuple(objects.items())))
+    return hashlib.sha256(content.encode()).hexdigest()
+
+
+def file_state(fname:str) -> [int, int] or None:
+    """Return size and modification time of given file, or None if it doesn't exists"""
+    try:
+        stat = os.stat(fname)
+    except FileNotFoundError:
+        return None
+    return [stat.st_size, stat.st_mtime_ns]
+
+
+class BuildCache:
+    """Manifest of the files written for each system, with the hash
+    of the model they were compiled from.
+
+    directory -- where the manifest is stored
+    reuse -- if False, no system is fresh: all are recompiled, but the files
+             written by previous compilations are still known, and new ones recorded
+
+    """
+
+    def __init__(self, directory:str, reuse:bool=True):
+        self.reuse = reuse
+        self.path = os.path.join(os.path.expanduser(directory), MANIFEST_NAME)
+        self.systems = self._load()  # planet file -> {'hash': model hash, 'files': {file: state}}
+        self.recorded = {}  # planet file -> entry, recorded since loading
+        # all files written by previous compilations
+        self.owned = {fname for entry in self.systems.values() for fname in entry['files']}
+
+    def _load(self) -> dict:
+        """Return the systems found in the manifest on disk"""
+        try:
+            with open(self.path) as fd:
+                manifest = json.load(fd)
+        except (OSError, ValueError):
+            return {}  # no usable manifest: everything will be recompiled
+        if manifest.get('version') != CACHE_VERSION:
+            return {}
+        return manifest.get('systems', {})
+
+    def is_fresh(self, digest:str, files:[str]) -> bool:
+        """True if given files were written from a model of given hash,
+        and were not modified since"""
+        entry = self.systems.get(os.path.abspath(files[-1])) if self.reuse else None
+        if entry is None or entry['hash'] != digest:
+            return False
+        states = entry['files']
+        return all(file_state(fname) is not None
+                   and states.get(os.path.abspath(fname)) == file_state(fname)
+                   for fname in files)
+
+    def owns(self, fname:str) -> bool:
+        """True if given file was written by a previous compilation"""
+        return os.path.abspath(fname) in self.owned
+
+    def record(self, digest:str, files:[str]):
+        """Register given files as just written from a model of given hash"""
+        states = {os.path.abspath(fname): file_state(fname) for fname in files}
+        entry = {'hash': digest, 'files': states}
+        self.systems[os.path.abspath(files[-1])] = self.recorded[os.path.abspath(files[-1])] = entry
+        self.owned.update(states)
+
+    def save(self):
+        """Write the manifest on disk, keeping the systems recorded
+        by concurrent compilations since it was loaded"""
+        with directory_lock(os.path.dirname(self.path)):
+            self.systems = {**self._load(), **self.recorded}
+            with atomic_open(self.path) as fd:
+                json.dump({'version': CACHE_VERSION, 'systems': self.systems}, fd)
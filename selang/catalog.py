@@ -0,0 +1,140 @@
+"""Packed outputs: all systems streamed either into one star catalog
+and one planet catalog, or into one zip archive (a SpaceEngine pak),
+along with an index locating each system.
+
+Outputs are written in temporary files, replacing the previous ones
+only when the writer is closed without error.
+
+"""
+
+import os
+import json
+import shutil
+import zipfile
+import tempfile
+import contextlib
+from .atomic import atomic_open
+from .compile import output_files, chunks_of, WRITE_BUFFER_SIZE
+
+
+ENCODING = 'utf-8'
+INDEX_EXTENSION = '.index.json'  # appended to the planet catalog name
+ARCHIVE_INDEX = 'index.json'  # name of the index in archives
+SPOOL_SIZE = 2 ** 24  # systems of archives are rendered in memory up to this size
+KINDS = 'star', 'planet'
+
+
+def index_path(planet_catalog:str) -> str:
+    """Return the path of the index of given planet catalog"""
+    return planet_catalog + INDEX_EXTENSION
+
+
+def _write(fd, blocks:[str]):
+    for chunk in chunks_of(blocks):
+        fd.write(chunk.encode(ENCODING))
+
+
+class CatalogWriter:
+    """Context manager writing systems, one after the other,
+    into one star catalog and one planet catalog.
+
+    The index, written next to the planet catalog (see index_path), maps
+    each system name to the offset and size in bytes of its records
+    in each catalog.
+
+    """
+
+    def __init__(self, star_catalog:str, planet_catalog:str):
+        self.catalogs = star_catalog, planet_catalog
+        self.index = {}  # system name -> {kind: [offset, size]}
+        self._stack = contextlib.ExitStack()
+        self._fds = ()
+
+    def __enter__(self) -> 'CatalogWriter':
+        self._fds = tuple(self._stack.enter_context(atomic_open(fname, 'wb', WRITE_BUFFER_SIZE))
+                          for fname in self.catalogs)
+        return self
+
+    def add(self, system_name:str, star_blocks:[str], planet_blocks:[str]):
+        """Write given blocks of given system.
+        On error, the catalogs are left as before the call."""
+        starts = tuple(fd.tell() for fd in self._fds)
+        try:
+            for fd, blocks in zip(self._fds, (star_blocks, planet_blocks)):
+                _write(fd, blocks)
+        except BaseException:
+            for fd, start in zip(self._fds, starts):
+                fd.seek(start)
+                fd.truncate()
+            raise
+        self.index[system_name] = {kind: [start, fd.tell() - start]
+                                   for kind, fd, start in zip(KINDS, self._fds, starts)}
+
+    def __exit__(self, *exc_info) -> bool:
+        self._stack.__exit__(*exc_info)
+        if exc_info[0] is None:
+            star_catalog, planet_catalog = map(os.path.abspath, self.catalogs)
+            with atomic_open(index_path(planet_catalog)) as fd:
+                json.dump({'star': star_catalog, 'planet': planet_catalog,
+                           'systems': self.index}, fd)
+        return False
+
+
+class ArchiveWriter:
+    """Context manager writing systems, one after the other, into a zip archive,
+    following the layout of SpaceEngine addons, so that it can be used as a pak.
+
+    The index, stored in the archive as ARCHIVE_INDEX, maps each system name
+    to the name of its files in the archive and the offset of their header.
+
+    """
+
+    def __init__(self, archive:str):
+        self.archive = archive
+        self.index = {}  # system name -> {kind: [entry name, header offset]}
+        self._stack = contextlib.ExitStack()
+        self._zip = None
+
+    def __enter__(self) -> 'ArchiveWriter':
+        fd = self._stack.enter_context(atomic_open(self.archive, 'wb', WRITE_BUFFER_SIZE))
+        self._zip = self._stack.enter_context(zipfile.ZipFile(fd, 'w', zipfile.ZIP_DEFLATED))
+        return self
+
+    def add(self, system_name:str, star_blocks:[str], planet_blocks:[str]):
+        """Write given blocks of given system.
+        The system is fully rendered before being added to the archive,
+        so that nothing is added on error."""
+        entries = [name.replace(os.sep, '/') for name in output_files(system_name, '')]
+        with tempfile.SpooledTemporaryFile(SPOOL_SIZE) as star_tmp, \
+                tempfile.SpooledTemporaryFile(SPOOL_SIZE) as planet_tmp:
+            _write(star_tmp, star_blocks)
+            _write(planet_tmp, planet_blocks)
+            self.index[system_name] = {}
+            for kind, entry, tmp in zip(KINDS, entries, (star_tmp, planet_tmp)):
+                tmp.seek(0)
+                with self._zip.open(entry, 'w') as fd:
+                    shutil.copyfileobj(tmp, fd)
+                self.index[system_name][kind] = [entry, self._zip.getinfo(entry).header_offset]
+
+    def __exit__(self, *exc_info) -> bool:
+        if exc_info[0] is None:
+            self._zip.writestr(ARCHIVE_INDEX, json.dumps({'systems': self.index}))
+        return self._stack.__exit__(*exc_info)
+
+
+def read_system(packed:str, system_name:str) -> (str, str):
+    """Return the star and planet records of given system, found in given archive
+    or planet catalog using its index"""
+    if zipfile.is_zipfile(packed):
+        with zipfile.ZipFile(packed) as archive:
+            entries = json.loads(archive.read(ARCHIVE_INDEX))['systems'][system_name]
+            return tuple(archive.read(entries[kind][0]).decode(ENCODING) for kind in KINDS)
+    with open(index_path(packed)) as fd:
+        index = json.load(fd)
+    records = []
+    for kind in KINDS:
+        offset, size = index['systems'][system_name][kind]
+        with open(index[kind], 'rb') as fd:
+            fd.seek(offset)
+            records.append(fd.read(size).decode(ENCODING))
+    return tuple(records)
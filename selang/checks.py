@@ -0,0 +1,154 @@
+"""Physical sanity checks of models, detecting orbits that make no sense:
+
+    hill -- the apoapsis of an object is outside the Hill sphere of its parent,
+            so the parent can't hold it
+    crossing -- the periapsis of an object is inside the apoapsis of a sibling
+                with a smaller semi-major axis, so their orbits may cross
+
+Co-orbital objects, like the bodies of a ring, share their semi-major axis
+and are not reported as crossing.
+
+Siblings are sorted per parent, so that checks run in O(n log n) for n orbits.
+Checks of big models are computed with array math when numpy is available,
+with the same results as the pure python ones.
+
+"""
+
+import math
+from collections import namedtuple
+from . import stats as stats_module
+from .objects import Model, Star, Planet
+from .compile import _numpy
+
+
+EARTH_MASS = 3.0034896e-6  # in solar masses
+VECTOR_SIZE = 1024  # smaller models are checked in pure python
+
+Issue = namedtuple('Issue', 'kind, uid, other, message')
+
+
+def masses(objects:dict, index:'ModelIndex') -> dict:
+    """Map each object uid to its mass in solar masses, barycenters
+    weighting as much as the objects orbiting them"""
+    mass_of = {}
+    for uid, obj in objects.items():
+        if isinstance(obj, Star):
+            mass_of[uid] = obj.solar_mass
+        elif isinstance(obj, Planet):
+            mass_of[uid] = obj.earth_mass * EARTH_MASS
+    for uid in sorted(set(objects) - set(mass_of), key=lambda uid: index.depth.get(uid, 0), reverse=True):
+        mass_of[uid] = sum(mass_of.get(child, 0) for child in index.childs_of(uid))
+    return mass_of
+
+
+def check_model(model:Model) -> [Issue]:
+    """Return the issues found in given model"""
+    with stats_module.current().stage('check'):
+        index = model.index
+        mass_of = masses(model.objects, index)
+        if not model.orbits:
+            return []
+        parents, childs, orbits = zip(*model.orbits)
+        axes = [float(orbit.semimajoraxis) for orbit in orbits]
+        eccentricities = [float(orbit.eccentricity or 0) for orbit in orbits]
+        position = {child: pos for pos, child in enumerate(childs)}  # child -> its orbit
+        parent_pos = [position.get(parent, -1) for parent in parents]
+        ratios = [mass_of.get(child, 0) / (3 * mass_of.get(parent, 0)) if mass_of.get(parent) else math.inf
+                  for parent, child in zip(parents, childs)]  # of the Hill radius
+        numpy = _numpy() if len(orbits) >= VECTOR_SIZE else None
+        if numpy is None:
+            found = _python_checks(parent_pos, axes, eccentricities, ratios)
+        else:
+            found = _vector_checks(numpy, parent_pos, axes, eccentricities, ratios)
+        return [_issue(kind, childs[pos], parents[pos] if other is None else childs[other],
+                       axes, eccentricities, ratios, parent_pos, pos, other)
+                for kind, pos, other in found]
+
+
+def _issue(kind:str, uid, other, axes:list, eccentricities:list, ratios:list,
+           parent_pos:list, pos:int, other_pos:int or None) -> Issue:
+    apoapsis = axes[pos] * (1 + eccentricities[pos])
+    if kind == 'hill':
+        parent = parent_pos[pos]
+        message = 'apoapsis {:g} AU outside the Hill sphere of {} (radius {:g} AU)'.format(
+            apoapsis, other, _hill_radius(axes[parent], eccentricities[parent], ratios[parent]))
+    else:
+        message = 'periapsis {:g} AU inside the apoapsis of {} ({:g} AU)'.format(
+            axes[pos] * (1 - eccentricities[pos]), other,
+            axes[other_pos] * (1 + eccentricities[other_pos]))
+    return Issue(kind, uid, other, message)
+
+
+def _hill_radius(axis:float, eccentricity:float, mass_ratio:float) -> float:
+    return axis * (1 - eccentricity) * mass_ratio ** (1 / 3)
+
+
+def _python_checks(parent_pos:list, axes:list, eccentricities:list, ratios:list) -> [(str, int, int)]:
+    """Return (kind, orbit position, sibling position or None) of each issue"""
+    found = []
+    hills = [_hill_radius(*args) for args in zip(axes, eccentricities, ratios)]
+    for pos, parent in enumerate(parent_pos):
+        if parent >= 0 and axes[pos] * (1 + eccentricities[pos]) > hills[parent]:
+            found.append(('hill', pos, None))
+    siblings = {}  # parent position -> positions of its childs
+    for pos, parent in enumerate(parent_pos):
+        siblings.setdefault(parent, []).append(pos)
+    for group in siblings.values():
+        group.sort(key=axes.__getitem__)
+        farthest = None  # sibling with the greatest apoapsis among those with smaller axis
+        candidate = None  # same, including those with the same axis
+        for idx, pos in enumerate(group):
+            if idx and axes[group[idx - 1]] < axes[pos]:
+                farthest = candidate
+            if farthest is not None and (axes[pos] * (1 - eccentricities[pos])
+                                         < axes[farthest] * (1 + eccentricities[farthest])):
+                found.append(('crossing', pos, farthest))
+            if candidate is None or (axes[pos] * (1 + eccentricities[pos])
+                                     >= axes[candidate] * (1 + eccentricities[candidate])):
+                candidate = pos
+    return sorted(found, key=lambda issue: (issue[1], issue[0]))
+
+
+def _vector_checks(numpy, parent_pos:list, axes:list, eccentricities:list,
+                   ratios:list) -> [(str, int, int)]:
+    """Return (kind, orbit position, sibling position or None) of each issue"""
+    parent_pos = numpy.array(parent_pos, dtype=numpy.int64)
+    axes = numpy.array(axes, dtype=numpy.float64)
+    eccentricities = numpy.array(eccentricities, dtype=numpy.float64)
+    apoapsis, periapsis = axes * (1 + eccentricities), axes * (1 - eccentricities)
+    hills = periapsis * numpy.array(ratios, dtype=numpy.float64) ** (1 / 3)
+    has_parent = parent_pos >= 0
+    outside = numpy.zeros(len(axes), dtype=bool)
+    outside[has_parent] = apoapsis[has_parent] > hills[parent_pos[has_parent]]
+
+    # siblings sorted by parent, then axis. Apoapsis and periapsis are replaced by their
+    #  rank, offset by the parent rank, so that one cumulative maximum over all orbits
+    #  gives, exactly, the greatest apoapsis among the previous siblings.
+    order = numpy.lexsort((axes, parent_pos))
+    values = numpy.unique(numpy.concatenate((apoapsis, periapsis)))
+    groups = (parent_pos[order] + 1) * len(values)
+    apo_rank = numpy.searchsorted(values, apoapsis[order]) + groups
+    peri_rank = numpy.searchsorted(values, periapsis[order]) + groups
+    greatest = numpy.maximum.accumulate(apo_rank)
+    positions = numpy.arange(len(order))
+    farthest = numpy.maximum.accumulate(numpy.where(apo_rank == greatest, positions, 0))
+    # previous siblings are those with a smaller axis: skip the co-orbital ones
+    axis_keys = numpy.searchsorted(numpy.unique(axes), axes[order]) + (parent_pos[order] + 1) * len(axes)
+    first = numpy.searchsorted(axis_keys, axis_keys)  # first orbit with the same parent and axis
+    previous = first - 1
+    crossing = (first > 0) & (peri_rank < greatest[previous])
+    found = [('hill', int(pos), None) for pos in numpy.flatnonzero(outside)]
+    found.extend(('crossing', int(order[idx]), int(order[farthest[previous[idx]]]))
+                 for idx in numpy.flatnonzero(crossing))
+    return sorted(found, key=lambda issue: (issue[1], issue[0]))
+
+
+def checked_models(models:[Model]) -> [Model]:
+    """Yield given models, after printing the issues found in each"""
+    stats = stats_module.current()
+    for model in models:
+        issues = check_model(model)
+        for issue in issues:
+            print('WARNING: {} {}: {} {}'.format(model.system_name, issue.kind, issue.uid, issue.message))
+        stats.count('orbit issues', len(issues))
+        yield model
@@ -33,6 +33,22 @@ def se_dir(filepath:str) -> str:
                                          "".format(filepath, ', '.join(no_found)))
     return filepath
 
+def positive_int(value:str) -> int:
+    """Argparse type, raising an error if given value is not a positive integer"""
+    try:
+        value = int(value)
+    except ValueError:
+        value = 0
+    if value < 1:
+        raise argparse.ArgumentTypeError("{} is not a positive integer".format(value))
+    return value
+
+def natural_int(value:str) -> int:
+    """Argparse type, raising an error if given value is not a natural integer"""
+    if not value.isdigit():
+        raise argparse.ArgumentTypeError("{} is not a natural integer".format(value))
+    return int(value)
+
 def writable_file(filepath:str) -> str:
     """Argparse type, raising an error if given file is not writable.
     Will delete the file !
@@ -45,13 +61,22 @@ def writable_file(filepath:str) -> str:
     except (PermissionError, IOError):
         raise argparse.ArgumentTypeError("file {} is not writable.".format(filepath))
 
+def replaceable_file(filepath:str) -> str:
+    """Argparse type, raising an error if given file can't be replaced,
+    as done when writing it atomically. The file itself is left untouched."""
+    directory = os.path.dirname(os.path.abspath(filepath))
+    if os.path.isdir(filepath) or not os.access(directory, os.W_OK | os.X_OK):
+        raise argparse.ArgumentTypeError("file {} is not writable.".format(filepath))
+    return filepath
+
 
 def cli_parser(description:str) -> argparse.ArgumentParser:
     # main parser
     parser = argparse.ArgumentParser(description=description.strip())
 
-    parser.add_argument('infile', type=existant_file,
-                        help="Name of the input file containing the system to render")
+    parser.add_argument('infile', type=existant_file, nargs='+',
+                        help="Input files containing the systems to render, or directories"
+                        " containing such files")
 
     # user may want to put automatically the system in place, or anywhere without treatment
     outdir = parser.add_mutually_exclusive_group()
@@ -62,5 +87,45 @@ def cli_parser(description:str) -> argparse.ArgumentParser:
 
     parser.add_argument('--overwrite', action='store_true',
                         help="Rewrite existing files")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Recompile all systems, even those unchanged since the last run")
+    parser.add_argument('--fsync', action='store_true',
+                        help="Make written files durable, syncing them on disk at the end")
+    parser.add_argument('--jobs', '-j', type=positive_int, default=1,
+                        help="Number of processes compiling the systems in parallel")
+    parser.add_argument('--check', action='store_true',
+                        help="Warn about implausible orbits: objects outside the Hill sphere"
+                        " of their parent, or crossing the orbit of a sibling")
+
+    # packed outputs are written once for all, so they can't be watched
+    packed = parser.add_mutually_exclusive_group()
+    packed.add_argument('--catalog', type=str, default=None,
+                        help="Write all systems in one star catalog and one planet catalog"
+                        " of given name, with an index locating each system")
+    packed.add_argument('--archive', type=replaceable_file, default=None,
+                        help="Write all systems in given zip archive (a SpaceEngine pak),"
+                        " with an index locating each system")
+    packed.add_argument('--binary', type=replaceable_file, default=None,
+                        help="Write all models in given file in selang binary format (.selang),"
+                        " reloaded without parsing nor solving when given as input")
+    packed.add_argument('--watch', '-w', action='store_true',
+                        help="Keep running, recompiling the systems of input files when they change")
+
+    # instrumentation
+    parser.add_argument('--profile', action='store_true',
+                        help="Print time spent in each stage of the compilation, and counters")
+    parser.add_argument('--stats-json', type=replaceable_file, default=None,
+                        help="Write time spent in each stage and counters in given JSON file")
+
+    # answer sets selection
+    asp = parser.add_argument_group('ASP inputs')
+    asp.add_argument('--models', '-n', type=natural_int, default=0,
+                     help="Maximal number of answer sets (systems) to render per file, 0 for all")
+    asp.add_argument('--optimal-only', action='store_true',
+                     help="Render only the optimal answer sets")
+    asp.add_argument('--seed', type=int, default=None,
+                     help="Sample answer sets randomly, using given seed")
+    asp.add_argument('--no-solve-cache', action='store_true',
+                     help="Solve all ASP files, even those solved before with the same options")
 
     return parser
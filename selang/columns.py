@@ -0,0 +1,279 @@
+"""Columnar storage of models, for systems with a huge number of bodies.
+
+Orbits are stored as parallel arrays (parent uids, child uids, and one column
+per orbit parameter), objects as a table mapping uids to indexes
+in a pool of unique objects.
+Both behave as the tuple of orbits and the dict of objects of a regular Model,
+building the (parent, child, Orbit) tuples and objects on access.
+
+"""
+
+from array import array
+from collections.abc import Mapping, Sequence
+from .objects import Model, Orbit, ORBIT_ARGS_ORDER
+
+
+# Kinds of values stored in a Column
+DEFAULT, FLOAT, INT, OTHER = range(4)
+MAX_EXACT_INT = 2 ** 53  # greater integers are not exactly stored by doubles
+
+
+def _picklable(state:dict) -> dict:
+    """Return given attributes, with the views over a mapped file
+    (see binary.load) copied into arrays, so that they can be pickled"""
+    return {name: array(value.format, value.tobytes()) if isinstance(value, memoryview) else value
+            for name, value in state.items()}
+
+
+def _kind_of(value:object, default:object) -> int:
+    if type(value) is type(default) and value == default:
+        return DEFAULT
+    if type(value) is float:
+        return FLOAT
+    if type(value) is int and -MAX_EXACT_INT <= value <= MAX_EXACT_INT:
+        return INT
+    return OTHER
+
+
+class Column:
+    """Values of one orbit parameter, for all orbits.
+
+    The first value becomes the default one, so that nothing is stored
+    as long as all values are equal to it.
+    Then, numbers are stored in an array of doubles, along with their kind,
+    so that they are given back with their original type.
+    Other values are kept once in a pool, their position in the pool
+    being stored in place of a number.
+
+    """
+
+    def __init__(self, default:object=None):
+        self.default = default
+        self.size = 0
+        self.kinds = self.numbers = None  # arrays, created with the first non-default value
+        self.pool = []  # distinct values that are not numbers
+        self.positions = {}  # (type, value) -> position in pool
+
+    def _number(self, value:object, kind:int) -> float:
+        """Return what to store in the numbers array for given value of given kind"""
+        if kind in {FLOAT, INT}:
+            return value
+        if kind == DEFAULT:
+            return 0.
+        try:
+            key = type(value), value
+            position = self.positions.get(key)
+        except TypeError:  # unhashable: not shared
+            key = position = None
+        if position is None:
+            position = len(self.pool)
+            self.pool.append(value)
+            if key is not None:
+                self.positions[key] = position
+        return position
+
+    def append(self, value:object):
+        if not self.size:
+            self.default = value
+        kind = _kind_of(value, self.default)
+        if kind != DEFAULT:
+            self._materialize()
+        if self.kinds is not None:
+            self.kinds.append(kind)
+            self.numbers.append(self._number(value, kind))
+        self.size += 1
+
+    def extend(self, values:[object]):
+        """Append all given values, in bulk if they are all floats"""
+        values = list(values)
+        if type(self.default) is not float and all(type(value) is float for value in values):
+            self._materialize()
+            self.kinds.frombytes(bytes([FLOAT]) * len(values))
+            self.numbers.fromlist(values)
+            self.size += len(values)
+        else:
+            for value in values:
+                self.append(value)
+
+    def extend_constant(self, value:object, nb_value:int):
+        """Append given value, nb_value times"""
+        if not self.size:
+            self.default = value
+        kind = _kind_of(value, self.default)
+        if kind != DEFAULT:
+            self._materialize()
+        if self.kinds is not None:
+            self.kinds.frombytes(bytes([kind]) * nb_value)
+            self.numbers.extend(array('d', [self._number(value, kind)]) * nb_value)
+        self.size += nb_value
+
+    def _materialize(self):
+        """Create the arrays, if not already done"""
+        if self.kinds is None:
+            self.kinds = array('B', bytes(self.size))
+            self.numbers = array('d', bytes(8 * self.size))
+
+    def __getitem__(self, row:int) -> object:
+        if self.kinds is None:
+            return self.default
+        kind = self.kinds[row]
+        if kind == DEFAULT:
+            return self.default
+        elif kind == FLOAT:
+            return self.numbers[row]
+        elif kind == INT:
+            return int(self.numbers[row])
+        return self.pool[int(self.numbers[row])]
+
+    def __getstate__(self) -> dict:
+        return _picklable(self.__dict__)
+
+
+class OrbitColumns(Sequence):
+    """Orbits stored as columns, seen as a sequence of (parent, child, Orbit).
+
+    Parent and child uids must be integers, as produced by as_model.
+
+    """
+
+    def __init__(self, orbits:[tuple]=()):
+        self.parents = array('q')
+        self.childs = array('q')
+        defaults = dict(zip(reversed(ORBIT_ARGS_ORDER), reversed(Orbit.__new__.__defaults__)))
+        self.columns = tuple(Column(defaults.get(field)) for field in ORBIT_ARGS_ORDER)
+        for orbit in orbits:
+            self.append(orbit)
+
+    def append(self, orbit:(int, int, Orbit)):
+        parent, child, orbit = orbit
+        self.parents.append(parent)
+        self.childs.append(child)
+        for column, value in zip(self.columns, orbit):
+            column.append(value)
+
+    def extend_ring(self, uid_pairs:[(int, int)], orbit:Orbit, angles:[float]):
+        """Append the orbits of a ring: all bodies share given orbit,
+        except for their angle"""
+        self.parents.extend(parent for parent, _ in uid_pairs)
+        self.childs.extend(child for _, child in uid_pairs)
+        for column, field, value in zip(self.columns, ORBIT_ARGS_ORDER, orbit):
+            if field == 'angle':
+                column.extend(angles)
+            else:
+                column.extend_constant(value, len(uid_pairs))
+
+    def __len__(self) -> int:
+        return len(self.parents)
+
+    def __getitem__(self, idx:int or slice) -> tuple:
+        if isinstance(idx, slice):
+            return tuple(self[row] for row in range(*idx.indices(len(self))))
+        if idx < 0:
+            idx += len(self)
+        if not 0 <= idx < len(self):
+            raise IndexError("orbit index out of range")
+        return self.parents[idx], self.childs[idx], Orbit(*(column[idx] for column in self.columns))
+
+    def __iter__(self) -> [tuple]:
+        columns = self.columns
+        for row, (parent, child) in enumerate(zip(self.parents, self.childs)):
+            yield parent, child, Orbit(*(column[row] for column in columns))
+
+    def __getstate__(self) -> dict:
+        return _picklable(self.__dict__)
+
+
+class ObjectTable(Mapping):
+    """Map from uid to object, storing each distinct object once.
+
+    Integer uids index an array of positions in the pool of distinct objects,
+    other uids are kept in a regular dict.
+    Iteration follows the insertion order, as for a dict. The order is only
+    stored once uids are not integers inserted in increasing order.
+
+    """
+
+    def __init__(self, objects:dict=None):
+        self.pool = []  # distinct objects
+        self.positions = {}  # (type, object) -> position in pool
+        self.identities = {}  # id of pooled object -> position in pool
+        self.index = array('i')  # uid -> position in pool, or -1
+        self.order = None  # uids in insertion order, if not those of index in order ; a list if not all integers
+        self.size = 0  # number of uids
+        self.others = {}  # non-integer uid -> position in pool
+        for uid, obj in (objects or {}).items():
+            self[uid] = obj
+
+    def __setitem__(self, uid:int, obj:object):
+        position = self.identities.get(id(obj))  # interned objects are not hashed
+        if position is None:
+            key = type(obj), obj  # namedtuples of different types may be equal
+            position = self.positions.get(key)
+            if position is None:
+                position = self.positions[key] = self.identities[id(obj)] = len(self.pool)
+                self.pool.append(obj)
+        if uid not in self:
+            if self.order is None and not (type(uid) is int and uid >= len(self.index)):
+                self.order = array('q', self)
+            if type(uid) is not int and isinstance(self.order, array):
+                self.order = list(self.order)
+            if self.order is not None:
+                self.order.append(uid)
+            self.size += 1
+        if type(uid) is int and uid >= 0:
+            if uid >= len(self.index):
+                self.index.extend([-1] * (uid + 1 - len(self.index)))
+            self.index[uid] = position
+        else:
+            self.others[uid] = position
+
+    def _position(self, uid:object) -> int:
+        if type(uid) is int and 0 <= uid < len(self.index):
+            return self.index[uid]
+        return self.others.get(uid, -1)
+
+    def __getitem__(self, uid:object) -> object:
+        position = self._position(uid)
+        if position < 0:
+            raise KeyError(uid)
+        return self.pool[position]
+
+    def __contains__(self, uid:object) -> bool:
+        try:
+            return self._position(uid) >= 0
+        except TypeError:  # unhashable uid
+            return False
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> [object]:
+        if self.order is None:
+            return (uid for uid, position in enumerate(self.index) if position >= 0)
+        return iter(self.order)
+
+    def __getstate__(self) -> dict:
+        state = _picklable(self.__dict__)
+        state['identities'] = {}  # ids of objects of this process only
+        return state
+
+
+class ColumnarModel(Model):
+    """Model storing its orbits and objects as OrbitColumns and ObjectTable.
+
+    Usable anywhere a Model is, notably by compile_to_gen.
+
+    """
+    __slots__ = ()
+
+    def __new__(cls, system_name:str, orbits:[tuple], objects:dict):
+        if not isinstance(orbits, OrbitColumns):
+            orbits = OrbitColumns(orbits)
+        if not isinstance(objects, ObjectTable):
+            objects = ObjectTable(objects)
+        return super().__new__(cls, system_name, orbits, objects)
+
+
+def as_columnar(model:Model) -> ColumnarModel:
+    """Return the ColumnarModel equivalent to given model"""
+    return ColumnarModel(*model)
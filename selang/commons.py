@@ -2,9 +2,15 @@
 import itertools
 
 
-# Generator of UID
-_uid_gen = itertools.count(1)
-uid_gen = lambda: next(_uid_gen)
+def uid_generator() -> callable:
+    """Return a new generator of UID, starting at 1.
+
+    Each system is built with its own generator, so that uids do not depend
+    on the other systems, nor on the process building it.
+
+    """
+    counter = itertools.count(1)
+    return lambda: next(counter)
 
 
 
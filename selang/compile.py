@@ -2,117 +2,368 @@
 of SpaceEngine scripts.
 
 """
+import io
 import os
+import operator
 import itertools
-from pprint import pprint
 
 from . import serepr
+from . import templates
 from . import commons
-from .objects import OBJECTS, Orbit, Ring, Barycenter
+from . import stats as stats_module
+from .objects import OBJECTS, ORBIT_ARGS_ORDER, Orbit, Ring, Barycenter
 from .objects_builder import ref
+from .inclusion import InclusionTree, ModelIndex
+from .cache import BuildCache, model_hash
+from .atomic import Syncer, directory_lock, temporary_name, remove_if_exists
+from .columns import OrbitColumns, ObjectTable
+
+
+RING_VECTOR_SIZE = 1024  # smaller rings are expanded body by body
+MAX_VECTOR_WRAPS = 16  # number of modulo applied before falling back to python
+MAX_INT_STEP = 2 ** 31  # greater integer steps could overflow numpy integers
+ANGLE_INDEX = ORBIT_ARGS_ORDER.index('angle')
+BLOCKS_PER_CHUNK = 256  # number of blocks joined before each write
+WRITE_BUFFER_SIZE = 2 ** 20
+NONES = (None,) * len(ORBIT_ARGS_ORDER)
 
 
 def compile_to_se(system_name:str, orbits:dict or tuple, objects:dict,
-                  se_addons_dir:str or (str, str), overwrite:bool=False) -> (str):
-    """Return names of written files"""
-    star_lines, planet_lines = compile_to_gen(system_name, orbits, objects)
-    system_name = system_name.replace(' ', '_')
+                  se_addons_dir:str or (str, str), overwrite:bool=False,
+                  cache:BuildCache=None, syncer:Syncer=None, index:ModelIndex=None) -> (str):
+    """Return names of written files.
+
+    Files are written in temporary files, then renamed over the targets
+    while holding the lock of the planet directory, so that they are never
+    seen partially written, even by concurrent compilations.
+
+    cache -- if given, files are not written when the model did not change
+             since they were compiled, and files written by a previous
+             compilation are overwritten.
+    syncer -- if given, receives the written files, to be synced later on disk
+    index -- ModelIndex of the model, reused instead of indexing the orbits again
+
+    """
+    stats = stats_module.current()
+    stats.count('systems')
+    files = star_file, planet_file = output_files(system_name, se_addons_dir)
+    if cache is not None:
+        digest = model_hash(system_name, orbits, objects)
+        if cache.is_fresh(digest, files):
+            stats.count('cached systems')
+            return star_file, planet_file
+
+    if not overwrite:
+        _check_overwrite(files, cache)
+    stats.count('orbits', len(orbits))
+    stats.count('objects', len(objects))
+    star_blocks, planet_blocks = compile_to_blocks(system_name, orbits, objects, index)
+    tmp_files = tuple(map(temporary_name, files))
+    try:
+        for tmp_file, blocks in zip(tmp_files, (star_blocks, planet_blocks)):
+            _write_blocks(tmp_file, blocks, stats)
+        with directory_lock(os.path.dirname(planet_file)):
+            if not overwrite:  # may have been written by a concurrent compilation
+                _check_overwrite(files, cache)
+            for tmp_file, fname in zip(tmp_files, files):
+                os.replace(tmp_file, fname)
+    except BaseException:
+        for tmp_file in tmp_files:
+            remove_if_exists(tmp_file)
+        raise
+    if syncer is not None:
+        for fname in files:
+            syncer.add(fname)
+    if cache is not None:
+        cache.record(digest, files)
+    return star_file, planet_file
+
+
+def compile_to_bytes(system_name:str, orbits:dict or tuple, objects:dict,
+                     buffer:io.BytesIO=None, index:ModelIndex=None) -> (memoryview, memoryview):
+    """Return the star and planet records, encoded in utf-8, as views
+    over the buffer they were rendered in.
+
+    buffer -- BytesIO to reuse, emptied first. If views over it are still
+              in use, a new buffer is used instead.
+    index -- ModelIndex of the model, reused instead of indexing the orbits again
+
+    """
+    buffer = _emptied(buffer)
+    star_blocks, planet_blocks = compile_to_blocks(system_name, orbits, objects, index)
+    for chunk in chunks_of(star_blocks):
+        buffer.write(chunk.encode())
+    star_size = buffer.tell()
+    for chunk in chunks_of(planet_blocks):
+        buffer.write(chunk.encode())
+    view = buffer.getbuffer()
+    return view[:star_size], view[star_size:]
+
+
+def _emptied(buffer:io.BytesIO=None) -> io.BytesIO:
+    """Return given buffer emptied, or a new one if not given or not resizable"""
+    if buffer is not None:
+        try:
+            buffer.seek(0)
+            buffer.truncate()
+            return buffer
+        except BufferError:  # views over its content are still alive
+            pass
+    return io.BytesIO()
+
+
+def _check_overwrite(files:(str, str), cache:BuildCache=None):
+    """Raise ValueError if star or planet file exists and was not written by a previous compilation"""
+    for kind, fname in zip(('Star', 'Planet'), files):
+        if os.path.exists(fname) and not (cache and cache.owns(fname)):
+            raise ValueError("{} record already exists: {}".format(kind, fname))
+
 
-    # choose the files to write
+def _write_blocks(fname:str, blocks:[str], stats:stats_module.Stats):
+    """Write given blocks of lines in given file, by chunks,
+    timing the rendering of the blocks apart from their writing"""
+    blocks = stats.timed('render', blocks)
+    if stats.enabled:
+        blocks = _counted_lines(blocks, stats)
+    with stats.stage('write'), open(fname, 'w', buffering=WRITE_BUFFER_SIZE) as fd:
+        for chunk in chunks_of(blocks):
+            fd.write(chunk)
+    if stats.enabled:
+        stats.count('files written')
+        stats.count('bytes written', os.path.getsize(fname))
+
+
+def chunks_of(blocks:[str]) -> [str]:
+    """Yield given blocks joined by BLOCKS_PER_CHUNK"""
+    blocks = iter(blocks)
+    while True:
+        chunk = ''.join(itertools.islice(blocks, BLOCKS_PER_CHUNK))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _counted_lines(blocks:[str], stats:stats_module.Stats) -> [str]:
+    """Yield given blocks, counting their lines in given stats"""
+    for block in blocks:
+        stats.count('lines', block.count('\n'))
+        yield block
+
+
+def output_dirs(se_addons_dir:str or (str, str)) -> (str, str):
+    """Return directories receiving the star and planet files"""
     if isinstance(se_addons_dir, str):
-        star_file = se_addons_dir, 'addons/catalogs/stars/'
-        planet_file = se_addons_dir, 'addons/catalogs/planets/'
-        star_fname = planet_fname = system_name + '.sc'
+        star_dir = os.path.join(se_addons_dir, 'addons/catalogs/stars/')
+        planet_dir = os.path.join(se_addons_dir, 'addons/catalogs/planets/')
     else:
         assert len(se_addons_dir) == 2, se_addons_dir
-        star_file, planet_file = se_addons_dir
+        star_dir, planet_dir = se_addons_dir
+    return os.path.expanduser(star_dir), os.path.expanduser(planet_dir)
+
+
+def output_files(system_name:str, se_addons_dir:str or (str, str)) -> (str, str):
+    """Return paths of the star and planet files of given system"""
+    system_name = system_name.replace(' ', '_')
+    star_dir, planet_dir = output_dirs(se_addons_dir)
+    if isinstance(se_addons_dir, str):
+        star_fname = planet_fname = system_name + '.sc'
+    else:
         star_fname = system_name + '.star.sc'
         planet_fname = system_name + '.planet.sc'
-    star_file = os.path.expanduser(os.path.join(*star_file, star_fname))
-    planet_file = os.path.expanduser(os.path.join(*planet_file, planet_fname))
+    return os.path.join(star_dir, star_fname), os.path.join(planet_dir, planet_fname)
 
-    if not overwrite:
-        if os.path.exists(star_file):
-            raise ValueError("Star record already exists: {}".format(star_file))
-        if os.path.exists(planet_file):
-            raise ValueError("Planet record already exists: {}".format(star_file))
-    with open(star_file, 'w') as fd:
-        for line in star_lines:
-            fd.write(line + '\n')
-    with open(planet_file, 'w') as fd:
-        for line in planet_lines:
-            fd.write(line + '\n')
-    return star_file, planet_file
 
-
-def compile_to_gen(system_name:str, orbits:dict, objects:dict) -> ([str], [str]):
+def compile_to_gen(system_name:str, orbits:dict, objects:dict,
+                   index:ModelIndex=None) -> ([str], [str]):
     """Return two generators of SpaceEngine script lines, one for the star file,
     one for the planet file.
 
     system_name -- name of the system in SpaceEngine
     orbits -- map from objects to orbiters and orbit info
     objects -- map from object uid to object definition
+    index -- ModelIndex of the model, reused instead of indexing the orbits again
+
+    """
+    star_lines, root_lines, name_of = _records_of(system_name, orbits, objects, index)
+    return star_lines, planet_lines_of(root_lines, orbits, objects, name_of)
+
+
+def compile_to_blocks(system_name:str, orbits:dict, objects:dict,
+                      index:ModelIndex=None) -> ([str], [str]):
+    """Return two generators of blocks of SpaceEngine script lines,
+    each line ending with a newline, one for the star file, one for the planet file.
+
+    Writing the blocks gives the same files as writing the lines
+    of compile_to_gen, but is far faster for big systems.
 
     """
-    name_of = lambda uid: system_name + '_' + str(type(objects[uid]).__name__).lower() + '_' + str(uid)
+    star_lines, root_lines, name_of = _records_of(system_name, orbits, objects, index)
+    return (_block_of(star_lines),
+            planet_blocks_of(_block_of(root_lines), orbits, objects, name_of))
+
 
-    # get root
-    roots, inc_tree = make_inclusion_tree(orbits)  # root uid -> {child_uid: {subchild uid: ...}}
-    if len(roots) != 1:
-        raise ValueError("Invalid number of roots. The {} roots are: {}".format(len(roots), ', '.join(map(str, roots))))
-    root = next(iter(roots))
-    del roots
+def _records_of(system_name:str, orbits:dict, objects:dict,
+                index:ModelIndex=None) -> ([str], [str], callable):
+    """Return lines of the star record, lines of the root in the planet file,
+    and the function giving the SpaceEngine name of an object uid"""
+    # get root, and names of objects
+    with stats_module.current().stage('inclusion tree'):
+        if index is None:
+            index = ModelIndex(system_name, orbits, objects)
+        root = index.root
+    name_of = index.name_of
 
     # special case: root is a barycenter. As such, the star line must contains
     #  it instead of the standard system name only.
     if isinstance(objects[root], Barycenter):
         star_lines = serepr.of_star_record(name_of(root))
-        planet_lines = ()
+        root_lines = ()
     else:  # regular case: register the root as child of the star record
         star_lines = serepr.of_star_record(system_name)
-        planet_lines = serepr.of_root(objects[root], name_of(root), system_name)
+        root_lines = serepr.of_root(objects[root], name_of(root), system_name)
+    return star_lines, root_lines, name_of
+
+
+def planet_lines_of(root_lines:[str], orbits:tuple, objects:dict, name_of:callable) -> [str]:
+    """Yield lines of the planet file: those of the root, then those
+    of each orbiting object, in a single flat pass over the orbits.
 
-    # compute se-repr of root
-    # compute se-repr of each object
+    """
+    yield from root_lines
     for parent, child, orbit in orbits:
-        lines = serepr.of_object(objects[child], name_of(child), name_of(parent),
-                                 content=serepr.of_orbit(orbit))
-        planet_lines = itertools.chain(planet_lines, lines)
-    return star_lines, planet_lines
+        yield from serepr.of_object(objects[child], name_of(child), name_of(parent),
+                                    content=serepr.of_orbit(orbit))
+
+
+def planet_blocks_of(root_blocks:[str], orbits:tuple, objects:dict, name_of:callable) -> [str]:
+    """Yield blocks of the planet file, as planet_lines_of yields its lines,
+    with one block per orbiting object.
 
+    Each object is rendered by a template compiled once for all the objects
+    equal to it having orbits with the same undefined parameters.
 
-def make_inclusion_tree(orbits) -> (set, dict):
-    direct_inclusions = {}  # parent -> child
+    """
+    yield from root_blocks
+    renderers = {}  # (object id, orbit shape) -> renderer
+    compiled_renderers = {}  # (object type, object repr, orbit shape) -> renderer
+    parent_names = {}  # parent uid -> name
     for parent, child, orbit in orbits:
-        direct_inclusions.setdefault(parent, set()).add(child)
-    # print('DIRECT INCLUSIONS:', direct_inclusions)
-    assert not any(parent in childs for parent, childs in direct_inclusions.items())
-    def all_childs_of(parent, inclusions=direct_inclusions) -> [object]:
-        """Yield all childs of given parent"""
-        ret = []
-        for child in inclusions.get(parent, ()):
-            ret.append(child)
-            ret.extend(all_childs_of(child, inclusions))
-        return ret
-    # close transitivity
-    for parent in tuple(direct_inclusions.keys()):
-        for child in all_childs_of(parent):
-            direct_inclusions[parent].add(child)
-
-    # print('INCLUSIONS:', direct_inclusions)
-    roots = set(direct_inclusions.keys()) - set(itertools.chain.from_iterable(direct_inclusions.values()))
-    if not roots:
-        roots = set(direct_inclusions.keys())
-    # print('ROOTS:', roots)
-    return roots, direct_inclusions
-
-
-def uidfy_data(orbits, objects) -> (dict, dict, dict, dict):
+        obj = objects[child]
+        shape = tuple(map(operator.is_, orbit, NONES)), not orbit[-1]
+        render = renderers.get((id(obj), shape))
+        if render is None:
+            key = type(obj), repr(obj), shape
+            if key not in compiled_renderers:
+                compiled_renderers[key] = _compiled_renderer(obj, orbit)
+            render = renderers[id(obj), shape] = compiled_renderers[key]
+        parent_name = parent_names.get(parent)
+        if parent_name is None:
+            parent_name = parent_names[parent] = name_of(parent)
+        yield render(name_of(child), parent_name, *orbit)
+
+
+def _compiled_renderer(obj:object, orbit:Orbit) -> callable:
+    """Return the renderer of given object with an orbit of the same shape as given one.
+
+    The renderer expects the object name, its parent name, and the orbit
+    parameters. Retrograde is not rendered, but decides of the inclination.
+
+    """
+    def lines_of(name, parent, *params):
+        params = (param if value is not None else None for param, value in zip(params, orbit))
+        orbit_fields = Orbit(*params)._replace(retrograde=orbit.retrograde)
+        return serepr.of_object(obj, name, parent, content=serepr.of_orbit(orbit_fields))
+    return templates.compiled(lines_of, len(orbit) + 2)
+
+
+def _block_of(lines:[str]) -> [str]:
+    """Yield given lines as a single block, if any"""
+    block = ''.join(line + '\n' for line in lines)
+    if block:
+        yield block
+
+
+def make_inclusion_tree(orbits) -> (set, InclusionTree):
+    """Return the roots of given orbits, and the InclusionTree indexing them.
+
+    Raise ValueError if orbits contains a cycle.
+    The transitive closure is available with InclusionTree.closure().
+
+    """
+    tree = InclusionTree(orbits)
+    cycle = tree.cycle()
+    if cycle:
+        raise ValueError("Orbits are cyclic: {}".format(' -> '.join(map(str, cycle))))
+    return tree.roots, tree
+
+
+def ring_angles(angle:float, angle_steps:[float]) -> [float]:
+    """Return the angles of the bodies of a ring, each being the angle
+    of the previous body (or given angle for the first) plus its step, modulo 360.
+
+    Large rings are computed at once using numpy, if available, with exactly
+    the same results as the body by body computation.
+
+    """
+    angle_steps = tuple(angle_steps)
+    if not angle_steps:
+        return []
+    first = (angle + angle_steps[0]) % 360
+    numpy = _numpy() if len(angle_steps) >= RING_VECTOR_SIZE else None
+    if numpy is not None:
+        steps_type = {type(step) for step in angle_steps[1:]}
+        if steps_type == {type(first)} == {float}:
+            return [first] + _vector_ring_angles(numpy, first, angle_steps[1:], numpy.float64)
+        if steps_type == {type(first)} == {int} and max(map(abs, angle_steps)) < MAX_INT_STEP:
+            return [first] + _vector_ring_angles(numpy, first, angle_steps[1:], numpy.int64)
+    angles = itertools.accumulate(itertools.chain((first,), angle_steps[1:]),
+                                  lambda angle, step: (angle + step) % 360)
+    return list(angles)
+
+
+def _vector_ring_angles(numpy, angle:float, angle_steps:tuple, dtype) -> [float]:
+    """Return the ring angles following given one, for given angle steps.
+
+    Angles are cumulative sums of the steps, computed sequentially as in python.
+    The modulo, that changes nothing for values in ]0;360[, is only applied
+    on other values, from which the cumulative sum is restarted.
+
+    """
+    steps = numpy.array(angle_steps, dtype=dtype)
+    angles = numpy.empty(len(steps) + 1, dtype=dtype)  # given angle, then ring angles
+    angles[0], angles[1:] = angle, steps
+    start = 0  # index of the last angle known to be final
+    for _ in range(MAX_VECTOR_WRAPS):
+        numpy.add.accumulate(angles[start:], out=angles[start:])
+        wrapped = numpy.flatnonzero((angles[start+1:] <= 0) | (angles[start+1:] >= 360))
+        if not len(wrapped):
+            return angles[1:].tolist()
+        start += int(wrapped[0]) + 1
+        angles[start] = angles[start].item() % 360
+        angles[start+1:] = steps[start:]
+    # too many wraps: finish body by body
+    angles = angles[1:start+1].tolist()
+    for step in angle_steps[start:]:
+        angles.append((angles[-1] + step) % 360)
+    return angles
+
+
+def _numpy() -> object or None:
+    """Return the numpy module, or None if not available"""
+    try:
+        import numpy
+    except ImportError:
+        return None
+    return numpy
+
+
+def uidfy_data(orbits, objects, columnar:bool=False) -> (dict, dict, dict, dict):
     """Return the same data, but with all user defined uid replaced by general uid,
     and all objects pushed into objects pool (no one-time-use objects).
 
     orbits -- orbit data
     objects -- map object uid -> object definition
+    columnar -- return orbits and objects as OrbitColumns and ObjectTable
 
     Returns:
     orbits -- orbit data
@@ -122,16 +373,21 @@ def uidfy_data(orbits, objects) -> (dict, dict, dict, dict):
 
 
     """
-    _uid_gen = itertools.count(1)
-    uid_gen = lambda: next(_uid_gen)
-    new_orbits = []
-    new_objects = {}
+    uid_gen = commons.uid_generator()
+    new_orbits = OrbitColumns() if columnar else []
+    new_objects = ObjectTable() if columnar else {}
     old_to_new_uids = {}
     uids = {useruid: uid_gen() for useruid in objects.keys()}  # user uid -> uid
 
+    lambda_objects = {}  # id -> lambda object, keeping it alive so that its id stays unique
+
     def make_uid(value):
         """Return an uid associated to given value. If value is not in uids map,
         then it's assumed to be a one-time-use lambda object"""
+        if id(value) in lambda_objects:  # interned object, no need to hash it again
+            new_uid = uid_gen()
+            new_objects[new_uid] = value
+            return new_uid
         already_seen = value in old_to_new_uids
         lambda_object = value not in uids and type(value) in OBJECTS
         raw_object = value not in uids and type(value) not in OBJECTS
@@ -141,6 +397,7 @@ def uidfy_data(orbits, objects) -> (dict, dict, dict, dict):
         if lambda_object:
             new_uid = uid_gen()
             new_objects[new_uid] = value
+            lambda_objects[id(value)] = value
             # print('LAMBDA:', value, ' -> ', new_uid)
         elif raw_object:  # hope it's in refs
             # print('RAW LAMBDA:', value)
@@ -156,22 +413,44 @@ def uidfy_data(orbits, objects) -> (dict, dict, dict, dict):
 
         return new_uid
 
+    def ring_bodies(bodies):
+        """Yield given ring bodies, with raw objects replaced by their ref,
+        computed only once for all the ring"""
+        refs = {}  # raw object -> ref
+        for body in bodies:
+            if body not in old_to_new_uids and body not in uids and type(body) not in OBJECTS:
+                if body not in refs:
+                    refs[body] = ref(body)
+                body = refs[body]
+            yield body
+
     # print('ORBITS:')
     # pprint(orbits)
     for parent, child, orbit in orbits:
         if isinstance(child, Ring) or isinstance(objects.get(child), Ring):
             child = objects.get(child, child)
-            base_orbit = orbit._asdict()
-            angle = orbit.angle
-            for body, angle_step in zip(child.bodies, child.angle_steps):
-                angle = (angle + angle_step) % 360
-                base_orbit['angle'] = angle
-                orbit = Orbit(**base_orbit)  # orbit specific to the child
-                new_orbits.append((make_uid(parent), make_uid(body), orbit))
+            if not child.bodies:
+                continue
+            parent_uid = make_uid(parent)
+            bodies = tuple(ring_bodies(child.bodies))
+            if parent in old_to_new_uids:  # all bodies orbit the same parent
+                uid_pairs = [(parent_uid, make_uid(body)) for body in bodies]
+            else:  # one-time-use parent, created again for each body
+                uid_pairs = [(parent_uid, make_uid(bodies[0]))]
+                uid_pairs += [(make_uid(parent), make_uid(body)) for body in bodies[1:]]
+            angles = ring_angles(orbit.angle, child.angle_steps)
+            if columnar:
+                new_orbits.extend_ring(uid_pairs, orbit, angles)
+            else:  # orbit specific to each child
+                head, tail = orbit[:ANGLE_INDEX], orbit[ANGLE_INDEX+1:]
+                new_orbits += [(parent_uid, body_uid, Orbit._make((*head, angle, *tail)))
+                               for (parent_uid, body_uid), angle in zip(uid_pairs, angles)]
         else:
             new_orbits.append((make_uid(parent), make_uid(child), orbit))
 
-    return tuple(new_orbits), new_objects, old_to_new_uids, uids
+    if not columnar:
+        new_orbits = tuple(new_orbits)
+    return new_orbits, new_objects, old_to_new_uids, uids
 
 
 def uniformized_orbits(orbits:dict or tuple) -> [tuple]:
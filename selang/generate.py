@@ -0,0 +1,147 @@
+"""Procedural generation of plausible systems: a star and its planets,
+with star types, planet counts, masses and semi-major axes sampled
+from configurable distributions.
+
+Each system is generated from its own random generator, seeded by
+the global seed and the index of the system, so that a system is the same
+whatever the number of generated systems, the batch size or the number of jobs.
+
+>>> model = system(seed=42, index=7)
+>>> model == system(seed=42, index=7), model.system_name
+(True, 'Procedural-42-7')
+
+"""
+
+import math
+import bisect
+import random
+import itertools
+import collections
+from collections import namedtuple
+from .objects import Model
+from .objects_builder import ref, planet, orbit
+from .model import as_model
+
+
+BATCH_SIZE = 1000  # number of systems per batch
+NAME_FORMAT = 'Procedural-{seed}-{index}'
+
+
+Parameters = namedtuple('Parameters', 'star_types, planet_classes, nb_planet, first_axis, axis_spacing, eccentricity, inclination')
+Parameters.__doc__ = """Distributions of the generated systems.
+
+star_types -- map from star preset name to its weight
+planet_classes -- map from planet class to its weight and its (min, max) mass
+                  in earth masses, sampled log-uniformly
+nb_planet -- (min, max) number of planets, sampled uniformly, at least 1
+first_axis -- (min, max) semi-major axis of the first planet, in AU
+axis_spacing -- (min, max) ratio between the semi-major axes of a planet
+                and the previous one, keeping orbits apart
+eccentricity -- (min, max) eccentricity of orbits
+inclination -- (min, max) inclination of orbits, in degrees
+
+"""
+DEFAULT_PARAMETERS = Parameters(
+    star_types={'red_dwarf': 75, 'sun': 20, 'blue_giant': 5},
+    planet_classes={'selena': (30, (0.01, 0.5)), 'terra': (35, (0.5, 5)),
+                    'neptune': (20, (5, 50)), 'jupiter': (15, (50, 2000))},
+    nb_planet=(1, 12),
+    first_axis=(0.05, 0.5),
+    axis_spacing=(1.4, 2.2),
+    eccentricity=(0, 0.2),
+    inclination=(0, 5),
+)
+
+
+def earth_radius(earth_mass:float) -> float:
+    """Return a plausible radius of a planet of given mass, in earth units,
+    following the piecewise power law of Chen & Kipping (2017)"""
+    if earth_mass < 2:
+        return earth_mass ** 0.28
+    if earth_mass < 130:
+        return 2 ** 0.28 * (earth_mass / 2) ** 0.59
+    return 2 ** 0.28 * 65 ** 0.59 * (earth_mass / 130) ** -0.04
+
+
+def system(seed:int=0, index:int=0, parameters:Parameters=DEFAULT_PARAMETERS) -> Model:
+    """Return the system of given index generated from given seed"""
+    return _system(seed, index, _Sampler(parameters))
+
+
+class _Sampler:
+    """Parameters prepared for fast sampling, shared by the systems of a batch"""
+
+    def __init__(self, parameters:Parameters):
+        self.parameters = parameters
+        self.stars = tuple(ref(name) for name in parameters.star_types)
+        self.star_weights = tuple(itertools.accumulate(parameters.star_types.values()))
+        self.classes = tuple(parameters.planet_classes)
+        self.class_weights = tuple(itertools.accumulate(weight for weight, _ in parameters.planet_classes.values()))
+        self.log_masses = tuple((math.log(low), math.log(high) - math.log(low))
+                                for _, (low, high) in parameters.planet_classes.values())
+
+
+def _picked(cum_weights:tuple, draw:float) -> int:
+    """Return the index drawn by given number in [0;1[, according to given cumulative weights"""
+    return bisect.bisect(cum_weights, draw * cum_weights[-1])
+
+
+def _system(seed:int, index:int, sampler:_Sampler) -> Model:
+    rng = random.Random('{}/{}'.format(seed, index))  # str seeds don't depend on hash randomization
+    draw, uniform = rng.random, rng.uniform
+    parameters = sampler.parameters
+    objects = {0: sampler.stars[_picked(sampler.star_weights, draw())]}
+    orbits = []
+    axis = uniform(*parameters.first_axis)
+    for uid in range(1, max(1, rng.randint(*parameters.nb_planet)) + 1):
+        cls_index = _picked(sampler.class_weights, draw())
+        log_low, log_range = sampler.log_masses[cls_index]
+        mass = math.exp(log_low + log_range * draw())
+        objects[uid] = planet(sampler.classes[cls_index], earth_radius=round(earth_radius(mass), 4),
+                              earth_mass=round(mass, 4))
+        orbits.append((0, uid, orbit(round(axis, 6),
+                                     eccentricity=round(uniform(*parameters.eccentricity), 4),
+                                     inclination=round(uniform(*parameters.inclination), 4),
+                                     angle=round(360 * draw(), 4))))
+        axis *= uniform(*parameters.axis_spacing)
+    return as_model(NAME_FORMAT.format(seed=seed, index=index), orbits, objects)
+
+
+def batch(seed:int, start:int, stop:int, parameters:Parameters=DEFAULT_PARAMETERS) -> [Model]:
+    """Return the systems of indexes in [start;stop[ generated from given seed"""
+    sampler = _Sampler(parameters)
+    return [_system(seed, index, sampler) for index in range(start, stop)]
+
+
+def batches(nb_system:int, seed:int=0, batch_size:int=BATCH_SIZE, jobs:int=1,
+            parameters:Parameters=DEFAULT_PARAMETERS) -> [[Model]]:
+    """Yield lists of at most batch_size systems, nb_system in total,
+    in the order of their index.
+
+    jobs -- number of processes generating the batches in parallel,
+            with at most two batches per process waiting
+
+    """
+    bounds = [(start, min(start + batch_size, nb_system))
+              for start in range(0, nb_system, batch_size)]
+    if jobs <= 1:
+        for start, stop in bounds:
+            yield batch(seed, start, stop, parameters)
+        return
+    from concurrent.futures import ProcessPoolExecutor  # costly, for jobs > 1 only
+    with ProcessPoolExecutor(jobs) as executor:
+        pending = collections.deque()
+        for start, stop in bounds:
+            pending.append(executor.submit(batch, seed, start, stop, parameters))
+            if len(pending) > 2 * jobs:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def models(nb_system:int, seed:int=0, batch_size:int=BATCH_SIZE, jobs:int=1,
+           parameters:Parameters=DEFAULT_PARAMETERS) -> [Model]:
+    """Yield nb_system generated systems, e.g. to be given to models_to_se.
+    See batches for arguments."""
+    for models_batch in batches(nb_system, seed, batch_size, jobs, parameters):
+        yield from models_batch
@@ -0,0 +1,149 @@
+"""Parent/child index over orbits, built and queried in linear time,
+and the indexes of a Model built upon it.
+
+"""
+
+import functools
+
+
+_END = object()  # marks the exhaustion of a childs iterator
+
+
+class InclusionTree:
+    """Adjacency index of the orbits: parent -> childs, and child -> parents.
+
+    Built in a single pass over the orbits. All traversals are iterative,
+    so arbitrarily deep hierarchies (moons of moons of moons...)
+    do not hit the recursion limit.
+    The transitive closure is only computed when explicitly asked.
+
+    """
+
+    def __init__(self, orbits:[tuple]):
+        self.childs = {}  # parent -> [child]
+        self.parents = {}  # child -> [parent]
+        for parent, child, *_ in orbits:
+            self.childs.setdefault(parent, []).append(child)
+            self.parents.setdefault(child, []).append(parent)
+
+    def __contains__(self, uid) -> bool:
+        return uid in self.childs or uid in self.parents
+
+    @property
+    def roots(self) -> set:
+        """Set of objects orbiting nothing"""
+        return {parent for parent in self.childs if parent not in self.parents}
+
+    def cycle(self) -> tuple or None:
+        """Return an orbit cycle as a tuple of uid, or None if there is none"""
+        done, in_path = set(), set()
+        for start in self.childs:
+            if start in done:
+                continue
+            path = [start]
+            stack = [iter(self.childs[start])]
+            in_path.add(start)
+            while stack:
+                child = next(stack[-1], _END)
+                if child is _END:  # all childs of path[-1] explored
+                    stack.pop()
+                    in_path.discard(path[-1])
+                    done.add(path.pop())
+                elif child in in_path:
+                    return tuple(path[path.index(child):]) + (child,)
+                elif child not in self.childs:  # a leaf: no cycle through it
+                    done.add(child)
+                elif child not in done:
+                    path.append(child)
+                    in_path.add(child)
+                    stack.append(iter(self.childs.get(child, ())))
+        return None
+
+    def all_childs_of(self, parent) -> [object]:
+        """Yield all direct and indirect childs of given parent, depth-first"""
+        stack = [iter(self.childs.get(parent, ()))]
+        seen = set()
+        while stack:
+            child = next(stack[-1], _END)
+            if child is _END:
+                stack.pop()
+            elif child not in seen:
+                seen.add(child)
+                yield child
+                stack.append(iter(self.childs.get(child, ())))
+
+    def closure(self) -> dict:
+        """Return the transitive closure, mapping parents to all their childs"""
+        return {parent: set(self.all_childs_of(parent)) for parent in self.childs}
+
+
+class ModelIndex(InclusionTree):
+    """Indexes of a model: those of InclusionTree, and the parent, depth
+    and SpaceEngine name of each object, each built on first access.
+
+    Indexes are built for given orbits and objects,
+    and must not be used once those are modified.
+
+    """
+
+    def __init__(self, system_name:str, orbits:[tuple], objects:dict):
+        super().__init__(orbits)
+        self.system_name, self.objects = system_name, objects
+
+    @functools.cached_property
+    def root(self) -> object:
+        """The only object orbiting nothing.
+        Raise ValueError if orbits are cyclic or have another number of roots."""
+        cycle = self.cycle()
+        if cycle:
+            raise ValueError("Orbits are cyclic: {}".format(' -> '.join(map(str, cycle))))
+        roots = self.roots
+        if len(roots) != 1:
+            raise ValueError("Invalid number of roots. The {} roots are: {}".format(len(roots), ', '.join(map(str, roots))))
+        return next(iter(roots))
+
+    @functools.cached_property
+    def parent(self) -> dict:
+        """Map each orbiting object to the object it orbits"""
+        return {child: parents[-1] for child, parents in self.parents.items()}
+
+    @functools.cached_property
+    def depth(self) -> dict:
+        """Map each object to its number of ancestors, the root having 0"""
+        depth = dict.fromkeys(self.roots, 0)
+        stack = list(depth)
+        while stack:
+            parent = stack.pop()
+            for child in self.childs.get(parent, ()):
+                if child not in depth:
+                    depth[child] = depth[parent] + 1
+                    stack.append(child)
+        return depth
+
+    @functools.cached_property
+    def names(self) -> dict:
+        """Map each object to its name in SpaceEngine"""
+        prefixes = {}  # object type -> prefix of the names
+        names = {}
+        for uid, obj in self.objects.items():
+            prefix = prefixes.get(type(obj))
+            if prefix is None:
+                prefix = prefixes[type(obj)] = '{}_{}_'.format(self.system_name, type(obj).__name__.lower())
+            names[uid] = prefix + str(uid)
+        return names
+
+    def name_of(self, uid) -> str:
+        return self.names[uid]
+
+    def childs_of(self, parent) -> list:
+        """Return direct childs of given object"""
+        return self.childs.get(parent, [])
+
+    def ancestors_of(self, uid) -> [object]:
+        """Yield the parent of given object, then the parent of its parent, etc."""
+        parent = self.parent
+        for _ in range(len(parent)):  # bounded, in case of cyclic orbits
+            if uid not in parent:
+                break
+            uid = parent[uid]
+            yield uid
@@ -1,24 +1,112 @@
 """Routines to build model from JSON data"""
 
+import os
+import re
 import json
 from .objects import Model, Orbit
 from .objects_builder import ref
-from .commons import uid_gen
+from .commons import uid_generator
+
+
+NDJSON_EXTENSIONS = {'.ndjson', '.jsonl'}
+CHUNK_SIZE = 2 ** 16  # number of characters read at once
+WHITESPACES = re.compile(r'[ \t\n\r]*')
+DELIMITERS = {' ', '\t', '\n', '\r', ',', ']'}  # may follow a value
 
 
 def data(fname:str) -> [dict]:
-    """Yield the extracted data from given file"""
+    """Yield the extracted data from given file, each system as soon as it is parsed.
+
+    The file holds either a system, a list of systems, or, for newline-delimited
+    JSON (.ndjson and .jsonl extensions), one system per line.
+
+    """
     with open(fname) as fd:
-        data = json.load(fd)
-        if isinstance(data, list):
-            yield from (datum for datum in data if isinstance(datum, dict))
+        if os.path.splitext(fname)[1] in NDJSON_EXTENSIONS:
+            values = (json.loads(line) for line in fd if line.strip())
         else:
-            assert isinstance(data, dict)
-            yield data
+            values = stream_values(fd)
+        yield from (value for value in values if isinstance(value, dict))
+
+
+def stream_values(fd, chunk_size:int=CHUNK_SIZE) -> [object]:
+    """Yield the values of the JSON list in given file, or the value itself
+    if it is not a list, without loading the whole file in memory.
+
+    As with json.load, anything but whitespaces after the value is an error,
+    raised once the list items are yielded.
+
+    >>> import io
+    >>> list(stream_values(io.StringIO('[1, {"a": 2}] ')))
+    [1, {'a': 2}]
+    >>> list(stream_values(io.StringIO('[1, 2] extra')))
+    Traceback (most recent call last):
+    json.decoder.JSONDecodeError: Extra data: line 1 column 8 (char 7)
+
+    """
+    decoder = json.JSONDecoder()
+    buffer, pos = '', 0
+
+    def next_char() -> str:
+        """Return next non-whitespace character, or empty string at end of file"""
+        nonlocal buffer, pos
+        while True:
+            pos = WHITESPACES.match(buffer, pos).end()
+            if pos < len(buffer):
+                return buffer[pos]
+            buffer, pos = fd.read(chunk_size), 0
+            if not buffer:
+                return ''
+
+    def next_value() -> object:
+        """Decode the value starting at pos, reading more data as needed"""
+        nonlocal buffer, pos
+        while True:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                end = None
+            # a value not followed by a delimiter may be truncated (e.g. numbers)
+            if end is None or buffer[end:end+1] not in DELIMITERS:
+                chunk = fd.read(max(chunk_size, len(buffer) - pos))
+                if chunk:
+                    buffer, pos = buffer[pos:] + chunk, 0
+                    continue
+                if end is None:  # the value is not valid, whatever follows
+                    value, end = decoder.raw_decode(buffer, pos)
+            pos = end
+            return value
+
+    def check_end():
+        """Raise JSONDecodeError if something else than whitespaces remains"""
+        if next_char():
+            raise json.JSONDecodeError("Extra data", buffer, pos)
+
+    if next_char() != '[':
+        value = next_value()
+        check_end()
+        yield value
+        return
+    pos += 1
+    if next_char() == ']':
+        pos += 1
+        check_end()
+        return
+    while True:
+        yield next_value()
+        delimiter = next_char()
+        pos += 1
+        if delimiter == ']':
+            check_end()
+            return
+        if delimiter != ',':
+            raise json.JSONDecodeError("Expecting ',' delimiter", buffer, pos - 1)
+        next_char()
 
 
-def root_info(json_data:dict, objects:dict) -> (str, str):
-    """Return the root uid and the system name.
+def root_info(json_data:dict, objects:dict) -> (str, str, callable):
+    """Return the root uid, the system name, and the uid generator
+    to be given to populate_orbits function.
 
     json_data -- json dict containing data
     objects -- dict. Modified, so root_uid maps to the root definition.
@@ -28,20 +116,20 @@ def root_info(json_data:dict, objects:dict) -> (str, str):
     root_uid = UID + '__' + NAME
     system_name = root_uid + ' system'
     objects[root_uid] = ref(root_type)
-    return root_uid, system_name
+    return root_uid, system_name, uid_generator()
 
 
-def populate_orbits(json_data:dict, orbits:list, objects:dict, root_uid:str):
+def populate_orbits(json_data:dict, orbits:list, objects:dict, root_uid:str, uid_gen:callable):
     assert isinstance(json_data, dict), json_data
     if 'childs' in json_data or 'child' in json_data:
         iter_childs = json_data.get('childs', json_data.get('child'))
         if isinstance(iter_childs, dict): iter_childs = [iter_childs]
         for child in iter_childs:
-            new_orbits = list(gen_orbits(root_uid, child, objects))
+            new_orbits = list(gen_orbits(root_uid, child, objects, uid_gen))
             for subchild in child.get('childs', ()):
-                new_orbits += gen_orbits(child['UID'], subchild, objects)
+                new_orbits += gen_orbits(child['UID'], subchild, objects, uid_gen)
             if 'child' in child:
-                new_orbits += gen_orbits(child['UID'], child['child'], objects)
+                new_orbits += gen_orbits(child['UID'], child['child'], objects, uid_gen)
             # handle childs of specific stars of rings
             if 'childof' in child and isinstance(child['childof'], dict):
                 for parent_index, childs in child['childof'].items():
@@ -55,12 +143,12 @@ def populate_orbits(json_data:dict, orbits:list, objects:dict, root_uid:str):
                         raise ValueError("Parent index for childs of rings element must be a integer value, not '{}'".format(parent_index))
                     parent_uid = new_orbits[int(parent_index)][1]
                     for subchild in childs:
-                        new_orbits += gen_orbits(parent_uid, subchild, objects)
+                        new_orbits += gen_orbits(parent_uid, subchild, objects, uid_gen)
 
             orbits.extend(new_orbits)
 
 
-def gen_orbits(parent:str, child:dict, objects:dict) -> [Orbit]:
+def gen_orbits(parent:str, child:dict, objects:dict, uid_gen:callable) -> [Orbit]:
     retrograde = child.get('retrograde', False)
     child_type = child.get('type')
     distance = child['distance']
@@ -69,11 +157,12 @@ def gen_orbits(parent:str, child:dict, objects:dict) -> [Orbit]:
         assert len(child_type) >= 2 and len(ring_params) == 2
         number, ring_type = ring_params
         angle_step = 360 / number
+        ring_object = ref(ring_type)
         for idx in range(number):
             angle = idx * angle_step
             new_uid = ring_type + str(uid_gen())
             child['UID'] = new_uid
-            objects[new_uid] = ref(ring_type)
+            objects[new_uid] = ring_object
             yield parent, new_uid, Orbit(distance, angle=angle, retrograde=retrograde)
     elif isinstance(child_type, str):
         new_uid = child_type + str(uid_gen())
@@ -2,52 +2,290 @@
 
 """
 
+import io
 import os
+import itertools
+import contextlib
+import collections
 from . import asp_model
 from . import json_model
+from . import binary
+from . import sc_model
 from . import commons
+from . import stats as stats_module
 from .objects import Model
-from .compile import compile_to_gen, compile_to_se, uidfy_data, uniformized_orbits
+from .columns import ColumnarModel
+from .cache import BuildCache, model_hash
+from .atomic import Syncer
+from .compile import (compile_to_gen, compile_to_se, compile_to_blocks, compile_to_bytes,
+                      uidfy_data, uniformized_orbits, output_dirs, output_files, _emptied)
 from .objects_builder import planet, orbit, ring, star, ref
 
 
-def models_to_se(models:[Model] or Model, se_addons_dir:str or (str, str)):
-    """Print given models into their dedicated files, into se addon dir"""
-    for model in ([models] if isinstance(models, Model) else models):
-        print('SYSTEM: {} ({} orbits)'.format(model.system_name, len(model.orbits)))
-        print('FILES:', '\n       '.join(model_to_se(model, se_addons_dir)))
-        print()
+def models_to_se(models:[Model] or Model, se_addons_dir:str or (str, str),
+                 jobs:int=1, overwrite:bool=True, cache:bool=False, rebuild:bool=False,
+                 fsync:bool=False, executor:object=None) -> [(str, Exception)]:
+    """Print given models into their dedicated files, into se addon dir.
 
-def model_to_se(model:Model, se_addons_dir:str):
+    jobs -- number of processes compiling the models in parallel.
+    overwrite -- rewrite existing files
+    cache -- skip models that did not change since their last compilation,
+             according to the manifest stored with the planet files.
+    rebuild -- with cache, compile all models anyway, still overwriting
+               the files written by previous compilations
+    fsync -- sync all written files on disk, at once at the end of the batch
+    executor -- ProcessPoolExecutor used if jobs > 1, instead of a new one,
+                so that the processes can be kept between two batches
+
+    Errors do not stop the batch: they are collected and returned
+    as (system name, error) pairs.
+
+    """
+    models = [models] if isinstance(models, Model) else models
+    stats = stats_module.current()
+    cache = BuildCache(output_dirs(se_addons_dir)[1], reuse=not rebuild) if cache else None
+    syncer = Syncer() if fsync else None
+    if jobs > 1:
+        results = _models_to_se_in_pool(models, se_addons_dir, jobs, overwrite, cache, executor)
+    else:
+        results = (_model_to_se_or_error(model, se_addons_dir, overwrite, cache)
+                   for model in models)
+    errors = []
+    try:
+        for system_name, nb_orbit, files, error in results:
+            print('SYSTEM: {} ({} orbits)'.format(system_name, nb_orbit))
+            if error is None:
+                print('FILES:', '\n       '.join(files))
+                for fname in (files if syncer else ()):
+                    syncer.add(fname)
+            else:
+                print('ERROR:', error)
+                errors.append((system_name, error))
+                stats.count('errors')
+            print()
+    finally:
+        if syncer is not None:
+            syncer.sync()
+        if cache is not None:
+            cache.save()
+    return errors
+
+def models_to_packed(models:[Model] or Model, writer:object) -> [(str, Exception)]:
+    """Stream given models into given catalog.CatalogWriter or catalog.ArchiveWriter.
+
+    Errors do not stop the batch: they are collected and returned
+    as (system name, error) pairs, and the failing systems are not written.
+
+    """
+    models = [models] if isinstance(models, Model) else models
+    stats = stats_module.current()
+    errors = []
+    with writer:
+        for model in models:
+            print('SYSTEM: {} ({} orbits)'.format(model.system_name, len(model.orbits)))
+            stats.count('systems')
+            try:
+                star_blocks, planet_blocks = compile_to_blocks(*model, model.index)
+                with stats.stage('write'):
+                    writer.add(model.system_name, stats.timed('render', star_blocks),
+                               stats.timed('render', planet_blocks))
+            except Exception as err:
+                print('ERROR:', err)
+                errors.append((model.system_name, err))
+                stats.count('errors')
+            print()
+    return errors
+
+def _model_to_se_or_error(model:Model, se_addons_dir:str or (str, str),
+                          overwrite:bool, cache:BuildCache=None, collect:bool=False) -> tuple:
+    """Return system name, number of orbits, written files and raised error,
+    followed by the collected stats if collect is True"""
+    stats = stats_module.Stats() if collect else stats_module.current()
+    with stats_module.collecting(stats):
+        try:
+            files, error = model_to_se(model, se_addons_dir, overwrite, cache), None
+        except Exception as err:
+            files, error = (), err
+    result = model.system_name, len(model.orbits), files, error
+    return (*result, stats.as_dict()) if collect else result
+
+def _models_to_se_in_pool(models:[Model], se_addons_dir:str or (str, str), jobs:int,
+                          overwrite:bool, cache:BuildCache=None, executor:object=None) -> [tuple]:
+    """Yield results of _model_to_se_or_error for given models,
+    computed by a pool of processes, in the order of the models.
+
+    Models are consumed lazily, with at most two models per process waiting.
+    Two models writing the same files are never compiled concurrently,
+    so that the last one always wins, as in sequential compilation.
+    The cache is only handled by the calling process.
+    Given executor is used and left open, else a new one is created and closed.
+    Stats collected by the processes are merged into the current stats.
+    Models that can't be sent to or compiled by a process, e.g. because
+    it died, are reported as failed, as in sequential compilation.
+
+    """
+    from concurrent.futures import Future, ProcessPoolExecutor, wait  # costly, for jobs > 1 only
+    stats = stats_module.current()
+    collect = stats.enabled
+    with contextlib.nullcontext(executor) if executor else ProcessPoolExecutor(jobs) as executor:
+        pending = collections.deque()  # (system name, number of orbits, files, model hash, future)
+        running = {}  # planet file -> future of the last model writing it
+        for model in models:
+            files = output_files(model.system_name, se_addons_dir)
+            if files[1] in running:
+                wait([running[files[1]]])
+            digest = model_hash(*model) if cache else None
+            if cache and cache.is_fresh(digest, files):  # counted as by compile_to_se
+                stats.count('systems')
+                stats.count('cached systems')
+                future = Future()
+                future.set_result((model.system_name, len(model.orbits), files, None))
+            else:
+                overwrite_model = overwrite or (cache and all(map(cache.owns, files)))
+                try:
+                    future = executor.submit(_model_to_se_or_error, model, se_addons_dir,
+                                             overwrite_model, collect=collect)
+                except Exception as err:  # broken or closed pool
+                    future = Future()
+                    future.set_exception(err)
+            pending.append((model.system_name, len(model.orbits), files, digest, future))
+            running[files[1]] = future
+            while pending and (len(pending) > 2 * jobs or pending[0][-1].done()):
+                yield _pop_result(pending, running, cache)
+        while pending:
+            yield _pop_result(pending, running, cache)
+
+def _pop_result(pending:collections.deque, running:dict, cache:BuildCache=None) -> tuple:
+    system_name, nb_orbit, files, digest, future = pending.popleft()
+    if running.get(files[1]) is future:
+        del running[files[1]]
+    try:
+        result = future.result()
+    except Exception as err:  # model not picklable, process killed
+        result = system_name, nb_orbit, (), err
+    if isinstance(result[-1], dict):  # stats collected by the process
+        *result, stats = result
+        stats_module.current().merge(stats)
+    if cache and result[-1] is None:
+        cache.record(digest, files)
+    return result
+
+def model_to_se(model:Model, se_addons_dir:str or (str, str), overwrite:bool=True,
+                cache:BuildCache=None, syncer:Syncer=None):
     """Print given model into its dedicated files, into se addon dir"""
     return compile_to_se(model.system_name, model.orbits, model.objects,
-                         se_addons_dir, overwrite=True)
+                         se_addons_dir, overwrite=overwrite, cache=cache, syncer=syncer,
+                         index=model.index)
 
 
-def as_model(system_name:str, orbits:dict or tuple, objects:dict) -> Model:
+def as_model(system_name:str, orbits:dict or tuple, objects:dict,
+             columnar:bool=False) -> Model:
     """Return Model defined by given data by applying
     some uniformization routines on it.
 
     Do not build a Model without this function, or you will end up with errors
     involving types and attributes mismatches.
 
+    columnar -- return a ColumnarModel, far more compact for huge systems
+
     """
-    orbits, objects, *_ = uidfy_data(tuple(uniformized_orbits(orbits)), objects)
+    with stats_module.current().stage('uidfy'):
+        orbits, objects, *_ = uidfy_data(uniformized_orbits(orbits), objects, columnar=columnar)
+    if columnar:
+        return ColumnarModel(system_name, orbits, objects)
     return Model(system_name, tuple(orbits), objects)
 
 
-def get_models(fname:str or iter) -> [Model]:
-    """Yield Models from file of given name, either in JSON or ASP"""
-    ext_to_class = {
-        '.lp': asp_model,
-        '.json': json_model,
-    }
+EXTRACTORS = {  # file extension -> module extracting data from it
+    '.lp': asp_model,
+    '.json': json_model,
+    **{ext: json_model for ext in json_model.NDJSON_EXTENSIONS},
+    **{ext: binary for ext in binary.EXTENSIONS},
+    '.sc': sc_model,
+}
+METADATA_SUFFIXES = ('.index.json',)  # files written by selang along its outputs (see catalog.INDEX_EXTENSION)
+EXTRACTION_STAGES = {asp_model: 'solve', json_model: 'parse', binary: 'load',
+                     sc_model: 'parse'}  # extractor -> stage name
+
+
+def model_to_bytes(model:Model, buffer:io.BytesIO=None) -> (memoryview, memoryview):
+    """Return star and planet records of given model, see compile_to_bytes"""
+    return compile_to_bytes(model.system_name, model.orbits, model.objects, buffer, model.index)
+
+def models_to_bytes(models:[Model] or Model, buffer:io.BytesIO=None) -> [(str, memoryview, memoryview)]:
+    """Yield system name, star and planet records of each given model,
+    rendered in the same buffer as long as the previous records are released"""
+    models = [models] if isinstance(models, Model) else models
+    for model in models:
+        buffer = _emptied(buffer)  # a new one if the previous records are alive
+        star, planet = model_to_bytes(model, buffer)
+        yield model.system_name, star, planet
+
+
+def get_models(fname:str or iter, nb_model:int=0, optimal_only:bool=False,
+               seed:int=None, solve_cache:'SolveCache'=None) -> [Model]:
+    """Yield Models from file(s) of given name(s), either in JSON,
+    newline-delimited JSON, ASP, selang binary format (see binary)
+    or SpaceEngine catalogs (see sc_model).
+
+    Directories are replaced by the files they contain in a handled format.
+    Consecutive ASP files are solved together (see asp_model.batch_data).
+
+    The other arguments select the answer sets of each ASP file:
+    nb_model -- maximal number of answer sets, 0 for all
+    optimal_only -- only optimal answer sets
+    seed -- if given, answer sets are sampled randomly using this seed
+    solve_cache -- solve_cache.SolveCache replaying the answer sets
+                   of unchanged ASP files instead of solving them again
+
+    """
+    stats = stats_module.current()
+    asp_options = {'nb_model': nb_model, 'optimal_only': optimal_only, 'seed': seed,
+                   'cache': solve_cache}
+    for extractor, fnames in itertools.groupby(input_files(fname), key=_extractor_of):
+        fnames = tuple(fnames)
+        stats.count('input files', len(fnames))
+        options = asp_options if extractor is asp_model else {}
+        if hasattr(extractor, 'models'):  # models stored as they are, not extracted
+            for fname in fnames:
+                yield from stats.timed(EXTRACTION_STAGES[extractor], extractor.models(fname))
+            continue
+        if len(fnames) > 1 and hasattr(extractor, 'batch_data'):
+            data = extractor.batch_data(fnames, **options)
+        else:
+            data = (datum for fname in fnames for datum in extractor.data(fname, **options))
+        for datum in stats.timed(EXTRACTION_STAGES[extractor], data):
+            with stats.stage('extract'):
+                model = model_from(datum, extract=extractor)
+            yield model
+
+
+def input_files(fnames:str or iter) -> [str]:
+    """Yield given files, replacing directories by the handled files they contain
+    (see _is_input), grouped by extension"""
+    for fname in ([fnames] if isinstance(fnames, str) else fnames):
+        if os.path.isdir(fname):
+            entries = (entry for entry in os.scandir(fname)
+                       if entry.is_file() and _is_input(entry.name))
+            yield from sorted((entry.path for entry in entries),
+                              key=lambda path: (os.path.splitext(path)[1], path))
+        else:
+            yield fname
+
+
+def _is_input(name:str) -> bool:
+    """True if file of given name, found in a directory, is an input file.
+    Hidden files, like the manifest of the build cache, and catalog indexes are not."""
+    return (not name.startswith('.') and not name.endswith(METADATA_SUFFIXES)
+            and os.path.splitext(name)[1] in EXTRACTORS)
+
+
+def _extractor_of(fname:str) -> object:
     ext = os.path.splitext(fname)[1]
     try:
-        extractor = ext_to_class[ext]
+        return EXTRACTORS[ext]
     except KeyError:
         raise ValueError("Extension {} is not handled".format(ext))
-    yield from (model_from(datum, extract=extractor) for datum in extractor.data(fname))
 
 
 def model_from(raw_data, extract) -> Model:
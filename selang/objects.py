@@ -1,8 +1,10 @@
 """Definitions for general objects"""
 
 
+import functools
 from collections import namedtuple
 from . import templates
+from .inclusion import ModelIndex
 
 
 ORBIT_ARGS_ORDER = ('semimajoraxis', 'eccentricity', 'obliquity', 'inclination',
@@ -15,7 +17,16 @@ BARY_ARGS_ORDER = ()
 
 
 # Model structure
-Model = namedtuple('Model', 'system_name, orbits, objects')
+class Model(namedtuple('Model', 'system_name, orbits, objects')):
+    """A system, with its indexes (see ModelIndex) built on first access
+    of the index attribute, then kept with the model"""
+
+    @functools.cached_property
+    def index(self) -> ModelIndex:
+        return ModelIndex(*self)
+
+    def __reduce__(self):  # pickle the fields only, not the indexes
+        return type(self), tuple(self)
 # Astres structures
 Star = namedtuple('Star', STAR_ARGS_ORDER)
 Planet = namedtuple('Planet', PLANET_ARGS_ORDER)
@@ -1,7 +1,7 @@
 """Routines to build the objects."""
 
-import inspect
-from itertools import islice, cycle
+import types
+from itertools import islice
 from .objects import Barycenter, Planet, Orbit, Ring, Star, OBJECTS
 
 
@@ -22,21 +22,21 @@ def ring(nb_body:int=None, bodies:object=None, *, angle_steps:float or iter=None
     if nb_body and not bodies and not isinstance(nb_body, int):
         bodies, nb_body = nb_body, None
     # compute bodies
-    if inspect.isgenerator(bodies) or isinstance(bodies, (list, tuple)):
+    if isinstance(bodies, types.GeneratorType) or isinstance(bodies, (list, tuple)):
         if nb_body is None:
             bodies = tuple(bodies)
-        else:  # take the given number in given iterable
-            bodies = tuple(islice(cycle([bodies]), 0, int(nb_body)))
+        else:  # take the given number in given iterable, repeated if needed
+            bodies = _repeated(tuple(islice(bodies, int(nb_body))), int(nb_body))
     else:
         bodies = (bodies,) * int(nb_body)
     nb_body = len(bodies)
     # compute angle steps
     if angle_steps is None:  # make them evenly distributed
-        angle_steps = [360 / nb_body] * nb_body
+        angle_steps = (360 / nb_body,) * nb_body
     elif isinstance(angle_steps, (int, float)):
-        angle_steps = [angle_steps] * nb_body
+        angle_steps = (angle_steps,) * nb_body
     else:
-        angle_steps = tuple(islice(cycle(angle_steps), 0, nb_body))
+        angle_steps = _repeated(tuple(islice(angle_steps, nb_body)), nb_body)
     return Ring(
         nb_body=len(bodies),
         bodies=bodies,
@@ -44,6 +44,13 @@ def ring(nb_body:int=None, bodies:object=None, *, angle_steps:float or iter=None
     )
 
 
+def _repeated(items:tuple, size:int) -> tuple:
+    """Return given items, repeated as needed to get given size"""
+    if not items or len(items) == size:
+        return items
+    return (items * (size // len(items) + 1))[:size]
+
+
 def star(spectral_class:str, solar_radius:float=None, solar_mass:float=None) -> Star:
     return Star(
         str(spectral_class),
@@ -72,25 +79,63 @@ def _astre_mass_radius(mass:float=None, radius:float=None) -> (float, float):
     return float(mass), float(radius)
 
 
+PRESETS = {  # preset name -> (builder, default arguments)
+    'sun': (star, {'solar_mass': 1, 'solar_radius': 1, 'spectral_class': 'G2V'}),
+    'red_dwarf': (star, {'solar_mass': 0.1, 'spectral_class': 'M5V'}),
+    'blue_giant': (star, {'solar_mass': 10, 'spectral_class': 'O9'}),
+    'earth': (planet, {'cls': 'terra', 'earth_mass': 1, 'earth_radius': 1}),
+    'moon': (planet, {'cls': 'luna', 'earth_mass': 0.1}),
+    'black_hole': (star, {'spectral_class': 'X', 'solar_mass': 2000}),
+    'barycenter': (barycenter, {}),
+}
+MAX_INTERNED = 2 ** 16  # number of objects kept by ref before emptying its cache
+_interned = {}  # (name, arguments) -> object built by ref
+
+
+def preset_name(name:str) -> str:
+    """Return the normalized version of given preset name"""
+    return name.replace(' ', '_').lower()
+
+
+def register_preset(name:str, builder:callable, **kwargs):
+    """Make ref(name) build an object with given builder and default arguments.
+
+    >>> register_preset('Proxima', star, spectral_class='M5.5Ve', solar_mass=0.12)
+    >>> ref('proxima')
+    Star(spectral_class='M5.5Ve', solar_mass=0.12, solar_radius=0.12)
+
+    """
+    name = preset_name(name)
+    PRESETS[name] = builder, kwargs
+    for key in tuple(_interned):
+        if key[0] == name:
+            del _interned[key]
+
+
 def ref(name:str, **kwargs) -> star or planet:
+    """Return the object of given preset name, built with given arguments
+    overriding the preset ones.
+
+    Objects are interned: the same object is returned for the same preset
+    name and arguments, so don't modify it.
+
+    """
     if not isinstance(name, str):
         raise TypeError("Can't handle given value of type {} as name: {}".format(type(name), name))
-    name = name.replace(' ', '_').lower()
-    if name == 'sun':
-        payload = star, {'solar_mass': 1, 'solar_radius': 1, 'spectral_class': 'G2V'}
-    elif name == 'red_dwarf':
-        payload = star, {'solar_mass': 0.1, 'spectral_class': 'M5V'}
-    elif name == 'blue_giant':
-        payload = star, {'solar_mass': 10, 'spectral_class': 'O9'}
-    elif name == 'earth':
-        payload = planet, {'cls': 'terra', 'earth_mass': 1, 'earth_radius': 1}
-    elif name == 'moon':
-        payload = planet, {'cls': 'luna', 'earth_mass': 0.1}
-    elif name == 'black_hole':
-        payload = star, {'spectral_class': 'X', 'solar_mass': 2000}
-    elif name == 'barycenter':
-        payload = barycenter, {}
-    else:
+    name = preset_name(name)
+    try:  # types are part of the key, since 1 == 1.0 == True
+        key = name, tuple((arg, type(value), value) for arg, value in sorted(kwargs.items()))
+        return _interned[key]
+    except KeyError:
+        pass
+    except TypeError:  # unhashable argument: no interning
+        key = None
+    if name not in PRESETS:
         raise NotImplementedError("Non-implemented name: '{}'".format(name))
-    func, fixed_kwargs = payload
-    return func(**{**fixed_kwargs, **kwargs})
+    func, fixed_kwargs = PRESETS[name]
+    obj = func(**{**fixed_kwargs, **kwargs})
+    if key is not None:
+        if len(_interned) >= MAX_INTERNED:
+            _interned.clear()
+        _interned[key] = obj
+    return obj
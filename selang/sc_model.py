@@ -0,0 +1,295 @@
+"""Routines to build models from SpaceEngine catalogs (.sc files),
+as written by selang (see templates).
+
+Catalogs are read line by line, and each system is yielded once
+its last object is read, so that catalogs of any size are read
+in memory bounded by the size of their biggest system.
+
+Compiling a model read from a file written by selang gives back this file.
+Only the fields written by the templates are read.
+Inclinations are read as they are written, so retrograde orbits
+are read as orbits of inclination greater than 180.
+
+Objects are grouped into systems using their name and the name of their parent:
+an object belongs to the current system if it is the parent of one of its objects,
+orbits one of them, or is named after the system. Objects without orbit, the roots,
+start a new system.
+Consecutive systems of the same name, the second having a barycenter as root,
+are therefore read as one.
+
+>>> model, = models_of(['Star "Sol_star_1"', '{', '    ParentBody "Sol"', '    Class "G2V"', '}'])
+>>> model.system_name, model.objects
+('Sol', {1: Star(spectral_class='G2V', solar_mass=None, solar_radius=None)})
+
+"""
+
+import re
+from collections import namedtuple
+from .objects import Model, Orbit, Star, Planet, Barycenter
+
+
+EARTH_RADIUS = 6378  # in km, as written by templates.se_planet
+OBJECT_TYPES = {  # SpaceEngine object type -> type of object in models
+    'Star': Star,
+    'StarBarycenter': Barycenter, 'Barycenter': Barycenter,
+    'Planet': Planet, 'Moon': Planet, 'DwarfPlanet': Planet, 'DwarfMoon': Planet,
+    'Asteroid': Planet, 'Comet': Planet,
+}
+TOKEN_REGEX = re.compile(r'"([^"]*)"|([{}])|(//)|([^\s{}"]+)')
+QUOTED, BRACE, COMMENT, WORD = range(1, 5)  # groups of TOKEN_REGEX
+BARYCENTER_ROOT_REGEX = re.compile(r'(.*)_barycenter_\d+')  # name of a barycenter root
+NAME_SUFFIX_REGEX = re.compile(r'[a-z]+_\d+')  # end of names given by selang, after the system name
+ORBIT_DEFAULTS = Orbit(None)
+OPENING, CLOSING = '{', '}'
+OPENING_LINE, CLOSING_LINE = (OPENING,), (CLOSING,)
+MAX_CACHED_VALUES = 2 ** 16  # number of distinct tokens whose value is kept
+_VALUES = {}  # token -> value
+
+
+Statement = namedtuple('Statement', 'key, values, body')
+Statement.__doc__ = """A line of SpaceEngine script: a key, the values following it,
+and the statements of the block opened after it, if any"""
+
+Record = namedtuple('Record', 'name, parent, obj, orbit')
+Record.__doc__ = """An object of a catalog, with the name of its parent,
+and its orbit, or None if it has none"""
+
+
+def models(fname:str) -> [Model]:
+    """Yield the models of systems defined in given file"""
+    with open(fname) as fd:
+        yield from models_of(fd)
+
+
+def models_of(lines:[str]) -> [Model]:
+    """Yield the models of systems defined by given lines of SpaceEngine script,
+    e.g. the content of a catalog given by catalog.read_system"""
+    system = _System()
+    for record in records(statements(lines)):
+        if record is None or not system.accepts(record):
+            if system.records:
+                yield system.model()
+            system = _System()
+        if record is not None:
+            system.add(record)
+    if system.records:
+        yield system.model()
+
+
+def statements(lines:[str]) -> [Statement]:
+    """Yield the top-level statements of given lines, each once complete"""
+    stack = []  # bodies of the blocks being read
+    last = None  # statement that a block opening would belong to
+    pending = None  # top-level statement that may still receive a block
+    for line in lines:
+        for item in _items(line.strip()):
+            if item is OPENING:
+                if last is None:
+                    raise ValueError("Block opened without statement: {}".format(line.strip()))
+                stack.append(last.body)
+                last = None
+            elif item is CLOSING:
+                if not stack:
+                    raise ValueError("Block closed without being opened: {}".format(line.strip()))
+                stack.pop()
+                last = None
+                if not stack and pending is not None:
+                    yield pending
+                    pending = None
+            else:
+                last = item
+                if stack:
+                    stack[-1].append(item)
+                else:
+                    if pending is not None:
+                        yield pending
+                    pending = item
+    if stack:
+        raise ValueError("{} block(s) not closed at end of file".format(len(stack)))
+    if pending is not None:
+        yield pending
+
+
+def _items(line:str) -> [Statement or str]:
+    """Return the statements of given stripped line, and the OPENING and CLOSING
+    of blocks between them, comments excluded"""
+    if line == '}':
+        return CLOSING_LINE
+    if line == '{':
+        return OPENING_LINE
+    if '{' not in line and '}' not in line and '/' not in line:
+        if '"' not in line:  # fast path for keys followed by numbers or words
+            key, *values = line.split()
+            return [Statement(key, [_value(value) for value in values], [])]
+        key, _, value = line.partition(' ')
+        value = value.strip()
+        if '"' not in key and value.count('"') == 2 and value[0] == value[-1] == '"':
+            return [Statement(key, [value[1:-1]], [])]  # fast path for a key and a string
+    items, statement = [], None  # statement receiving the values
+    for match in TOKEN_REGEX.finditer(line):
+        group = match.lastindex
+        if group == COMMENT:
+            break
+        if group == BRACE:
+            items.append(OPENING if match.group(BRACE) == '{' else CLOSING)
+            statement = None
+        elif statement is None:
+            statement = Statement(match.group(group), [], [])
+            items.append(statement)
+        elif group == QUOTED:
+            statement.values.append(match.group(group))
+        else:
+            statement.values.append(_value(match.group(group)))
+    return items
+
+
+def _value(token:str) -> object:
+    """Return the value written as given unquoted token, a number only if it
+    would be written back the same way"""
+    value = _VALUES.get(token)
+    if value is not None:
+        return value
+    value = token
+    try:
+        number = float(token)
+    except ValueError:
+        pass
+    else:
+        if repr(number) == token:
+            value = number
+        elif number.is_integer() and token.lstrip('-').isdigit() and str(int(token)) == token:
+            value = int(token)
+    if len(_VALUES) < MAX_CACHED_VALUES:
+        _VALUES[token] = value
+    return value
+
+
+def records(statements:[Statement]) -> [Record or None]:
+    """Yield a Record for each object defined by given statements,
+    and None for each object orbiting nothing, like the star records,
+    that separate the systems"""
+    for statement in statements:
+        obj_type = OBJECT_TYPES.get(statement.key)
+        if obj_type is None or not statement.values:  # Remove statements, unhandled objects
+            continue
+        fields = {field.key: field for field in statement.body}
+        if 'ParentBody' not in fields:
+            yield None
+            continue
+        obj = _object(obj_type, fields)
+        orbit = _orbit(fields['Orbit'], fields) if 'Orbit' in fields else None
+        yield Record(str(statement.values[0]), str(_first_value(fields['ParentBody'])), obj, orbit)
+
+
+def _first_value(statement:Statement or None) -> object:
+    return statement.values[0] if statement is not None and statement.values else None
+
+
+def _object(obj_type:type, fields:dict) -> object:
+    if obj_type is Star:
+        return Star(_first_value(fields.get('Class')), _first_value(fields.get('MassSol')),
+                    _first_value(fields.get('RadSol')))
+    if obj_type is Planet:
+        radius = _first_value(fields.get('Radius'))
+        if isinstance(radius, (int, float)):
+            radius = radius / EARTH_RADIUS
+        return Planet(_first_value(fields.get('Class')), _first_value(fields.get('Mass')), radius)
+    return Barycenter()
+
+
+def _orbit(orbit:Statement, fields:dict) -> Orbit:
+    orbit_fields = {field.key: field for field in orbit.body}
+
+    def value(key:str, default:object=None) -> object:
+        return _first_value(orbit_fields[key]) if key in orbit_fields else default
+
+    return Orbit(
+        semimajoraxis=value('SemiMajorAxis'),
+        eccentricity=value('Eccentricity'),
+        obliquity=_first_value(fields['Obliquity']) if 'Obliquity' in fields else ORBIT_DEFAULTS.obliquity,
+        inclination=value('Inclination'),
+        ascending_node=value('AscendingNode'),
+        arg_of_pericenter=value('ArgOfPericenter'),
+        angle=value('MeanAnomaly'),
+        refplane=value('RefPlane', ORBIT_DEFAULTS.refplane),
+    )
+
+
+class _System:
+    """Records of the system being read"""
+
+    def __init__(self):
+        self.records = []
+        self.names = set()  # names of the objects
+        self.parents = set()  # names of the objects orbited by the objects
+        self.root = None  # record of the object without orbit, orbiting the system
+        self.interned = {}  # (type, object) -> object, so that equal objects are stored once
+        self.prefix = None  # system name and separator, starting the names given by selang
+
+    def accepts(self, record:Record) -> bool:
+        """True if given record belongs to the system"""
+        if not self.records:
+            return True
+        if record.orbit is None:  # a root, written first
+            return False
+        return (record.parent in self.names or record.parent in self.parents
+                or record.name in self.parents
+                or (record.name.startswith(self.prefix)
+                    and NAME_SUFFIX_REGEX.fullmatch(record.name, len(self.prefix)) is not None))
+
+    def add(self, record:Record):
+        if not self.records:
+            self.prefix = _system_name(record) + '_'
+        if record.orbit is None:
+            self.root = record
+        obj = self.interned.setdefault((type(record.obj), record.obj), record.obj)
+        self.records.append(record._replace(obj=obj))
+        self.names.add(record.name)
+        self.parents.add(record.parent)
+
+    def model(self) -> Model:
+        """Return the model of the system, with the uids found in the names
+        of objects written by selang.
+
+        Objects orbited but not defined, like a barycenter root,
+        are barycenters.
+
+        """
+        system_name = _system_name(self.root or self.records[0])
+        uids = {}  # name -> uid
+        objects = {}
+
+        def add_object(name:str, obj:object):
+            uid = uids.get(name)
+            if uid is None:
+                uid = _uid(name, type(obj), system_name)
+                if uid in objects:  # same uid in the name of objects of different types
+                    uid = name
+                uids[name] = uid
+            objects[uid] = obj
+
+        for name in sorted(self.parents - self.names - {system_name if self.root else None}):
+            add_object(name, Barycenter())
+        for record in self.records:
+            add_object(record.name, record.obj)
+        orbits = tuple((uids[record.parent], uids[record.name], record.orbit)
+                       for record in self.records if record.orbit is not None)
+        return Model(system_name, orbits, objects)
+
+
+def _system_name(record:Record) -> str:
+    """Return the name of the system of given record, as the first of the system"""
+    if record.orbit is None:  # the root, orbiting the system itself
+        return record.parent
+    match = BARYCENTER_ROOT_REGEX.fullmatch(record.parent)
+    return match.group(1) if match else record.parent
+
+
+def _uid(name:str, obj_type:type, system_name:str) -> int or str:
+    """Return the uid of object of given name, as written by ModelIndex.names,
+    or the name itself if it is not written by selang"""
+    prefix = '{}_{}_'.format(system_name, obj_type.__name__.lower())
+    uid = name[len(prefix):]
+    if name.startswith(prefix) and uid.isdigit() and str(int(uid)) == uid:
+        return int(uid)
+    return name
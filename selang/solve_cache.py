@@ -0,0 +1,150 @@
+"""On-disk cache of the answer sets of ASP files, so that unchanged files
+are not grounded and solved again.
+
+Entries are keyed on the text of the file and of the files it includes,
+the solver options and the versions of the solver and of python.
+They hold the parsed answer sets, marshalled then compressed.
+
+Entries are written atomically, so that concurrent builds
+sharing the cache never read a partially written one,
+and the cache is bounded in size and in age of its entries.
+
+"""
+
+import os
+import re
+import sys
+import time
+import zlib
+import marshal
+import hashlib
+from . import stats as stats_module
+from .atomic import atomic_open, directory_lock, remove_if_exists
+
+
+CACHE_VERSION = 2  # change it when the format or the content of the entries changes
+MAGIC = b'SELANG-ASP'  # first bytes of each entry
+ENTRY_EXTENSION = '.answers'
+MAX_SIZE = 2 ** 28  # bytes used by the cache before evicting the least recently used entries
+MAX_AGE = 30 * 24 * 3600  # seconds since their last use before entries are evicted
+INCLUDE_REGEX = re.compile(r'#include\s*"((?:[^"\\]|\\.)*)"\s*\.')
+
+
+def default_directory() -> str:
+    """Return the directory of the cache, following the XDG specification"""
+    cache_home = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+    return os.path.join(cache_home, 'selang', 'solve')
+
+
+def program_files(fname:str) -> [str] or None:
+    """Return given file and the files it includes, directly or not,
+    or None if one of them can't be found"""
+    files, stack = [], [fname]
+    while stack:
+        fname = stack.pop()
+        if fname in files:
+            continue
+        try:
+            with open(fname, encoding='utf-8', errors='surrogateescape') as fd:
+                text = fd.read()
+        except OSError:
+            return None
+        files.append(fname)
+        for included in INCLUDE_REGEX.findall(text):
+            candidates = (os.path.join(os.path.dirname(fname), included), included)
+            stack.append(next((path for path in candidates if os.path.isfile(path)), included))
+    return files
+
+
+class SolveCache:
+    """Cache of answer sets, stored in given directory.
+
+    max_size -- bytes used by the entries before evicting the least recently used ones
+    max_age -- seconds since their last use before entries are evicted
+
+    """
+
+    def __init__(self, directory:str=None, max_size:int=MAX_SIZE, max_age:float=MAX_AGE):
+        self.directory = directory or default_directory()
+        self.max_size, self.max_age = max_size, max_age
+        os.makedirs(self.directory, exist_ok=True)
+
+    def key(self, fname:str, **options) -> str or None:
+        """Return the key of the answer sets of given file solved with given options,
+        or None if the file or one of its includes can't be read"""
+        files = program_files(fname)
+        if files is None:
+            return None
+        digest = hashlib.sha256(repr((CACHE_VERSION, _solver_version(), sys.version_info[:2],
+                                      sorted(options.items()))).encode())
+        for path in files:
+            with open(path, 'rb') as fd:
+                digest.update(hashlib.sha256(fd.read()).digest())
+        return digest.hexdigest()
+
+    def path(self, key:str) -> str:
+        return os.path.join(self.directory, key + ENTRY_EXTENSION)
+
+    def has(self, key:str) -> bool:
+        return os.path.exists(self.path(key))
+
+    def load(self, key:str) -> [dict] or None:
+        """Return the answer sets stored under given key, or None if there is none"""
+        try:
+            with open(self.path(key), 'rb') as fd:
+                content = fd.read()
+            if not content.startswith(MAGIC):
+                raise ValueError("not a cache entry")
+            answers = marshal.loads(zlib.decompress(content[len(MAGIC):]))
+            os.utime(self.path(key))  # mark it as recently used
+        except FileNotFoundError:  # never stored, or evicted
+            return None
+        except (OSError, ValueError, EOFError, TypeError, zlib.error):  # corrupted
+            remove_if_exists(self.path(key))
+            return None
+        stats_module.current().count('solve cache hits')
+        return answers
+
+    def store(self, key:str, answers:[dict]):
+        """Store given answer sets under given key, then evict old entries"""
+        content = MAGIC + zlib.compress(marshal.dumps(list(answers)))
+        with atomic_open(self.path(key), 'wb') as fd:
+            fd.write(content)
+        self.evict()
+
+    def recording(self, key:str, answers:iter) -> iter:
+        """Yield given answer sets, storing them under given key
+        once they are all yielded"""
+        stats_module.current().count('solve cache misses')
+        recorded = []
+        for answer in answers:
+            recorded.append(answer)
+            yield answer
+        self.store(key, recorded)
+
+    def evict(self):
+        """Remove entries unused for too long, then the least recently used ones
+        until the cache fits in its maximal size"""
+        with directory_lock(self.directory):
+            entries = []  # (last use, size, path)
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith(ENTRY_EXTENSION):
+                    try:
+                        stat = entry.stat()
+                    except FileNotFoundError:
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            entries.sort(reverse=True)  # most recently used first
+            oldest_allowed, size = time.time() - self.max_age, 0
+            for last_use, entry_size, path in entries:
+                size += entry_size
+                if last_use < oldest_allowed or size > self.max_size:
+                    remove_if_exists(path)
+
+
+def _solver_version() -> str or None:
+    try:
+        import clingo
+    except ImportError:  # clyngor uses the clingo binary
+        return None
+    return clingo.__version__
@@ -0,0 +1,163 @@
+"""Instrumentation of the compilation pipeline: timers and counters per stage.
+
+Collection is enabled by making a Stats object the current one:
+
+    with collecting(Stats()) as stats:
+        models_to_se(get_models('systems.lp'), '.')
+    print(stats.report())
+
+When no Stats is collecting, current() returns NO_STATS,
+whose methods do nothing, so that instrumented code runs at full speed.
+
+Stages are timed exclusively: the time of a stage running inside another one
+is not counted in the outer stage.
+
+The current Stats and the running stages are kept per context (see contextvars),
+so that concurrent tasks collect their own stats, and code running in threads
+(see in_context) neither sees nor mixes the stages of others.
+
+"""
+
+import time
+import contextlib
+import contextvars
+import collections
+
+
+class Stats:
+    """Time spent per stage, and counters, of a compilation.
+
+    hooks -- callables called with stage name and duration (in seconds)
+             each time a stage ends, e.g. to feed a dashboard
+
+    """
+    enabled = True
+
+    def __init__(self, hooks:[callable]=()):
+        self.timings = collections.Counter()  # stage -> seconds
+        self.counters = collections.Counter()  # counter name -> value
+        self.hooks = list(hooks)
+        self.started = time.perf_counter()
+
+    def add_hook(self, hook:callable):
+        """Call given hook with stage name and duration at the end of each stage"""
+        self.hooks.append(hook)
+
+    @contextlib.contextmanager
+    def stage(self, name:str):
+        """Context manager timing its content as given stage"""
+        start = time.perf_counter()
+        token = _stack.set(_stack.get() + (0.,))
+        try:
+            yield self
+        finally:
+            duration = time.perf_counter() - start
+            nested = _stack.get()[-1]
+            _stack.reset(token)
+            self._add_time(name, duration - nested, duration)
+
+    def timed(self, name:str, iterable:iter) -> iter:
+        """Yield items of given iterable, timing their production as given stage"""
+        iterator, duration = iter(iterable), 0.
+        try:
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(iterator)
+                finally:
+                    elapsed = time.perf_counter() - start
+                    duration += elapsed
+                    self.timings[name] += elapsed
+                    _add_nested_time(elapsed)  # not part of the running stage
+                yield item
+        except StopIteration:
+            pass
+        finally:
+            for hook in self.hooks:
+                hook(name, duration)
+
+    def count(self, name:str, value:int=1):
+        """Increase given counter"""
+        self.counters[name] += value
+
+    def merge(self, other:dict or 'Stats'):
+        """Add timings and counters of given stats, or of their as_dict() dict"""
+        if isinstance(other, Stats):
+            other = other.as_dict()
+        self.timings.update(other['timings'])
+        self.counters.update(other['counters'])
+
+    def _add_time(self, name:str, exclusive:float, duration:float):
+        self.timings[name] += exclusive
+        _add_nested_time(duration)
+        for hook in self.hooks:
+            hook(name, exclusive)
+
+    def as_dict(self) -> dict:
+        """Return timings, counters and total duration, JSON serializable"""
+        return {
+            'total': time.perf_counter() - self.started,
+            'timings': dict(self.timings),
+            'counters': dict(self.counters),
+        }
+
+    def report(self) -> str:
+        """Return a human readable summary"""
+        total = time.perf_counter() - self.started
+        lines = ['PROFILE: {:.3f}s in total'.format(total)]
+        for name, duration in self.timings.most_common():
+            lines.append('  {:<16} {:>9.3f}s {:>6.1%}'.format(name, duration, duration / total if total else 0))
+        for name, value in sorted(self.counters.items()):
+            lines.append('  {:<16} {:>10}'.format(name, value))
+        return '\n'.join(lines)
+
+
+class NoStats:
+    """Stats doing nothing, used when instrumentation is disabled"""
+    enabled = False
+
+    def stage(self, name:str):
+        return _NO_STAGE
+
+    def timed(self, name:str, iterable:iter) -> iter:
+        return iterable
+
+    def count(self, name:str, value:int=1):
+        pass
+
+
+_NO_STAGE = contextlib.nullcontext()
+NO_STATS = NoStats()
+_current = contextvars.ContextVar('selang_stats', default=NO_STATS)
+_stack = contextvars.ContextVar('selang_stages', default=())  # time spent in the nested stages of each running stage
+
+
+def _add_nested_time(duration:float):
+    """Count given duration as spent in a stage nested in the running one, if any"""
+    stack = _stack.get()
+    if stack:
+        _stack.set(stack[:-1] + (stack[-1] + duration,))
+
+
+def current() -> Stats or NoStats:
+    """Return the Stats collecting data, or NO_STATS"""
+    return _current.get()
+
+
+@contextlib.contextmanager
+def collecting(stats:Stats or None) -> Stats:
+    """Context manager making given stats the current one, in the current context.
+    If stats is None, instrumentation is disabled."""
+    token, stack_token = _current.set(stats or NO_STATS), _stack.set(())
+    try:
+        yield stats
+    finally:
+        _stack.reset(stack_token)
+        _current.reset(token)
+
+
+def in_context(func:callable) -> callable:
+    """Return a function calling given one in a copy of the current context,
+    e.g. to be run in another thread with the current stats"""
+    context = contextvars.copy_context()
+    return lambda *args: context.run(func, *args)
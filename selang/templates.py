@@ -2,6 +2,64 @@
 
 """
 
+import re
+
+
+FIELD_MARK = '\x00'  # delimits the fields in the output of templates being compiled
+FIELD_REGEX = re.compile(FIELD_MARK + r'(\d+)' + FIELD_MARK)
+
+
+class Field:
+    """Placeholder for a value given at rendering of a compiled template.
+
+    index -- position of the value in the arguments given at rendering
+    fields -- list receiving the (index, offset) of each formatted field
+    offset -- added to the value at rendering
+
+    """
+
+    def __init__(self, index:int, fields:list, offset:object=None):
+        self.index, self.fields, self.offset = index, fields, offset
+
+    def __add__(self, offset:object) -> 'Field':
+        assert self.offset is None, "only one offset per field is supported"
+        return Field(self.index, self.fields, offset)
+
+    def __format__(self, spec:str) -> str:
+        self.fields.append((self.index, self.offset))
+        return FIELD_MARK + str(len(self.fields) - 1) + FIELD_MARK
+
+
+def compiled(build:callable, nb_field:int) -> callable:
+    """Return a function rendering, in a single format pass, the block
+    of lines (each ending with a newline) yielded by build.
+
+    build -- callable returning lines, called with nb_field Field objects.
+             Fields must only be formatted or offset by the template.
+    The returned function expects the nb_field values replacing the fields.
+
+    """
+    fields = []
+    lines = build(*(Field(index, fields) for index in range(nb_field)))
+    text = ''.join(line + '\n' for line in lines)
+    text = text.replace('{', '{{').replace('}', '}}')
+    offsets = []  # (index, offset) of fields computed at rendering
+
+    def replace_field(match) -> str:
+        index, offset = fields[int(match.group(1))]
+        if offset is None:
+            return '{' + str(index) + '}'
+        offsets.append((index, offset))
+        return '{' + str(nb_field + len(offsets) - 1) + '}'
+
+    render = FIELD_REGEX.sub(replace_field, text).format
+    if not offsets:
+        return render
+    if len(offsets) == 1:
+        (index, offset), = offsets
+        return lambda *values: render(*values, values[index] + offset)
+    return lambda *values: render(*values, *[values[index] + offset for index, offset in offsets])
+
 def se_star(parent:str, name:str, spectral_class:str=None, solar_masses:float=None, solar_radius:float=None, procgen:bool=False, content:[str]=(), accretion_disk:bool=False) -> [str]:
     yield 'Star    "{}"'.format(name)
     yield '{'
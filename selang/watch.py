@@ -0,0 +1,81 @@
+"""Watch mode: recompile the systems of input files each time they change.
+
+Input files are polled, so that it works anywhere without dependencies.
+The process stays alive between edits, so python modules and the clingo
+module are imported only once, and the build cache skips the systems
+that did not change in a modified file.
+
+"""
+
+import time
+from .cache import file_state
+from .model import get_models, models_to_se, input_files
+from .checks import checked_models
+
+
+POLL_INTERVAL = 0.2  # seconds between two checks of the input files
+
+
+def file_states(fnames:str or iter) -> dict:
+    """Map input files, directories being replaced by the files they contain,
+    to their size and modification time"""
+    states = {}
+    for fname in input_files(fnames):
+        state = file_state(fname)
+        if state is not None:  # removed since listed
+            states[fname] = state
+    return states
+
+
+def changed_files(old_states:dict, new_states:dict) -> [str]:
+    """Return files of new_states that are absent or different in old_states"""
+    return [fname for fname, state in new_states.items() if old_states.get(fname) != state]
+
+
+def watch(fnames:str or iter, se_addons_dir:str or (str, str), interval:float=POLL_INTERVAL,
+          jobs:int=1, overwrite:bool=False, cache:bool=True, rebuild:bool=False,
+          fsync:bool=False, check:bool=False, **model_options):
+    """Compile the systems of given input files, then recompile those
+    of each modified or new input file, until interrupted.
+
+    interval -- seconds between two checks of the input files
+    check -- print the issues found in the orbits of each compiled model
+    model_options -- given to get_models
+    See models_to_se for other arguments.
+
+    The same pool of processes is used for the whole session if jobs > 1.
+
+    """
+    if jobs > 1:
+        from concurrent.futures.process import ProcessPoolExecutor, BrokenProcessPool  # costly, for jobs > 1 only
+        executor = ProcessPoolExecutor(jobs)
+    else:
+        executor = None
+    try:
+        states = {}
+        while True:
+            new_states = file_states(fnames)
+            changed = changed_files(states, new_states)
+            states = new_states
+            if changed:
+                print('CHANGED:', ', '.join(changed))
+                start = time.perf_counter()
+                try:
+                    models = get_models(changed, **model_options)
+                    if check:
+                        models = checked_models(models)
+                    errors = models_to_se(models, se_addons_dir, jobs=jobs, overwrite=overwrite,
+                                          cache=cache, rebuild=rebuild, fsync=fsync, executor=executor)
+                except Exception as err:  # invalid input, probably being edited
+                    print('ERROR:', err)
+                    if executor is not None and isinstance(err, BrokenProcessPool):  # a process died: start new ones
+                        executor.shutdown(wait=False)
+                        executor = ProcessPoolExecutor(jobs)
+                else:
+                    print('DONE in {:.2f}s{}'.format(time.perf_counter() - start,
+                          ', {} system(s) failed'.format(len(errors)) if errors else ''))
+                print('Watching for changes…')
+            time.sleep(interval)
+    finally:
+        if executor is not None:
+            executor.shutdown()